@@ -3,19 +3,70 @@
 from __future__ import annotations
 import json
 import random
+import asyncio
 import datetime
+import functools
+import gc
+import gzip
+import hashlib
+import heapq
+import bisect
 import csv
 import io
+import itertools
+import multiprocessing
 import os
+import signal
+import socket
+import socketserver
+import struct
+import sys
+import threading
+import time
+import urllib.parse
+import wsgiref.simple_server
+from http.server import BaseHTTPRequestHandler
+from array import array
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, asdict
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Iterable
 
 try:
-    from flask import Flask, request, render_template_string, jsonify, send_file, make_response
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except Exception:
+    np = None
+    NUMPY_AVAILABLE = False
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except Exception:
+    brotli = None
+    BROTLI_AVAILABLE = False
+
+try:
+    from flask import Flask, Response, request, render_template, stream_template, jsonify, send_file, make_response
+    from werkzeug.http import parse_accept_header, parse_etags, quote_etag
+    from werkzeug.serving import DechunkedInput
+    from werkzeug.wsgi import LimitedStream
     FLASK_AVAILABLE = True
 except Exception:
     FLASK_AVAILABLE = False
 
+try:
+    import gunicorn.app.base
+    GUNICORN_AVAILABLE = True
+except Exception:
+    GUNICORN_AVAILABLE = False
+
+try:
+    import uvicorn
+    ASYNC_AVAILABLE = True
+except Exception:
+    ASYNC_AVAILABLE = False
+
 # ----------------------------
 # Data models
 # ----------------------------
@@ -64,19 +115,16 @@ class Recipe:
             score += 2
         if 'hearty' in tag_lowers and ('gain' in g or 'muscle' in g):
             score += 2
+        for style in MOOD_STYLES.get(m, ()):
+            if style in tag_lowers:
+                score += MOOD_STYLE_BONUS
         return score
 
     def contains_forbidden(self, forbidden: List[str]) -> bool:
         """Return True if any forbidden term appears in ingredient names."""
         if not forbidden:
             return False
-        lower_keys = ' '.join(self.ingredients.keys()).lower()
-        for f in forbidden:
-            if f.strip() == '':
-                continue
-            if f.lower() in lower_keys:
-                return True
-        return False
+        return compile_forbidden(forbidden).search(ingredient_text(self.ingredients))
 
     def add_rating(self, value: float):
         try:
@@ -88,593 +136,674 @@ class Recipe:
             pass
 
 
+# ----------------------------
+# Forbidden ingredient matcher
+# ----------------------------
+def ingredient_text(ingredients: Dict[str, float]) -> str:
+    """Normalized text that forbidden terms are searched in."""
+    return ' '.join(ingredients.keys()).lower()
+
+
+class ForbiddenMatcher:
+    """Aho-Corasick automaton answering "does any term occur in this text?".
+
+    Short term lists fall back to plain substring checks, which run in C.
+    """
+    SUBSTRING_LIMIT = 4
+
+    def __init__(self, terms: Iterable[str]):
+        self.terms = tuple(terms)
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[bool] = [False]
+        if len(self.terms) > self.SUBSTRING_LIMIT:
+            self._build()
+
+    def _build(self):
+        goto, fail, out = self._goto, self._fail, self._out
+        for term in self.terms:
+            state = 0
+            for ch in term:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][ch] = nxt
+                    goto.append({})
+                    fail.append(0)
+                    out.append(False)
+                state = nxt
+            out[state] = True
+        queue = list(goto[0].values())
+        for state in queue:
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0)
+                out[nxt] = out[nxt] or out[fail[nxt]]
+
+    def search(self, text: str) -> bool:
+        if not self.terms:
+            return False
+        if len(self.terms) <= self.SUBSTRING_LIMIT:
+            return any(t in text for t in self.terms)
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                return True
+        return False
+
+
+@functools.lru_cache(maxsize=256)
+def _compile_forbidden(key: tuple) -> ForbiddenMatcher:
+    return ForbiddenMatcher(key)
+
+
+def forbidden_key(forbidden: Optional[Iterable[str]]) -> tuple:
+    """Canonical, hashable form of a forbidden list (lowercased, deduplicated, sorted)."""
+    return tuple(sorted({f.strip().lower() for f in (forbidden or []) if f.strip()}))
+
+
+def compile_forbidden(forbidden: Optional[Iterable[str]]) -> ForbiddenMatcher:
+    """Return a cached matcher for the given forbidden terms."""
+    return _compile_forbidden(forbidden_key(forbidden))
+
+
 # ----------------------------
 # Recipe storage & load
 # ----------------------------
+# Вбудовані рецепти лежать у recipes.jsonl поруч із цим файлом.
+# Фото генеруються pollination.ai за описом страви (seed у URL тримає картинку стабільною).
+SAMPLE_CATALOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'recipes.jsonl')
+
 RECIPES: List[Recipe] = []
 
+
+def recipe_to_dict(recipe: Recipe) -> dict:
+    return asdict(recipe)
+
+
+def recipe_from_dict(d: dict) -> Recipe:
+    nut = d.get('nutrition') or {}
+    return Recipe(
+        str(d['id']),
+        d.get('name_uk', ''),
+        list(d.get('tags') or []),
+        dict(d.get('ingredients') or {}),
+        Nutrition(nut.get('calories', 0), nut.get('protein', 0), nut.get('carbs', 0), nut.get('fats', 0)),
+        list(d.get('steps_uk') or []),
+        d.get('image', ''),
+        rating=d.get('rating', 0.0) or 0.0,
+        votes=d.get('votes', 0) or 0,
+    )
+
+
+@dataclass
+class RecipeSummary:
+    """The part of a recipe needed for filtering and scoring; `locator` goes back to CatalogLoader.fetch()."""
+    id: str
+    tags: List[str]
+    ingredients_text: str
+    nutrition: Nutrition
+    rating: float
+    votes: int
+    locator: int
+
+
+class CatalogLoader:
+    """Source of recipes for RecipeCatalog: summaries in bulk, full recipes one at a time by fetch()."""
+
+    def iter_summaries(self) -> Iterable[RecipeSummary]:
+        raise NotImplementedError
+
+    def fetch(self, locator: int) -> Recipe:
+        raise NotImplementedError
+
+    def iter_recipes(self) -> Iterable[Recipe]:
+        for s in self.iter_summaries():
+            yield self.fetch(s.locator)
+
+
+class JsonlCatalogLoader(CatalogLoader):
+    """One JSON recipe per line; the locator is the byte offset of the line."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def iter_summaries(self) -> Iterable[RecipeSummary]:
+        with open(self.path, 'rb') as f:
+            offset = 0
+            for line in f:
+                start = offset
+                offset += len(line)
+                if not line.strip():
+                    continue
+                d = json.loads(line)
+                nut = d.get('nutrition') or {}
+                yield RecipeSummary(
+                    str(d['id']),
+                    list(d.get('tags') or []),
+                    ingredient_text(d.get('ingredients') or {}),
+                    Nutrition(nut.get('calories', 0), nut.get('protein', 0), nut.get('carbs', 0), nut.get('fats', 0)),
+                    d.get('rating', 0.0) or 0.0,
+                    d.get('votes', 0) or 0,
+                    start,
+                )
+
+    def fetch(self, locator: int) -> Recipe:
+        with open(self.path, 'rb') as f:
+            f.seek(locator)
+            return recipe_from_dict(json.loads(f.readline()))
+
+    def iter_recipes(self) -> Iterable[Recipe]:
+        with open(self.path, 'rb') as f:
+            for line in f:
+                if line.strip():
+                    yield recipe_from_dict(json.loads(line))
+
+
+class SqliteCatalogLoader(CatalogLoader):
+    """SQLite `recipes` table (see write_sqlite_catalog); the locator is the rowid."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def _connect(self):
+        import sqlite3
+        return sqlite3.connect(self.path)
+
+    def iter_summaries(self) -> Iterable[RecipeSummary]:
+        conn = self._connect()
+        try:
+            cur = conn.execute('SELECT rowid, id, tags, ingredients, calories, protein, carbs, fats, rating, votes FROM recipes ORDER BY rowid')
+            for rowid, rid, tags, ingredients, cal, prot, carbs, fats, rating, votes in cur:
+                yield RecipeSummary(
+                    rid,
+                    json.loads(tags or '[]'),
+                    ingredient_text(json.loads(ingredients or '{}')),
+                    Nutrition(cal or 0, prot or 0, carbs or 0, fats or 0),
+                    rating or 0.0,
+                    votes or 0,
+                    rowid,
+                )
+        finally:
+            conn.close()
+
+    def fetch(self, locator: int) -> Recipe:
+        conn = self._connect()
+        try:
+            row = conn.execute('SELECT id, name_uk, tags, ingredients, calories, protein, carbs, fats, steps_uk, image, rating, votes FROM recipes WHERE rowid = ?', (locator,)).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            raise KeyError(locator)
+        return self._recipe(row)
+
+    def iter_recipes(self) -> Iterable[Recipe]:
+        conn = self._connect()
+        try:
+            cur = conn.execute('SELECT id, name_uk, tags, ingredients, calories, protein, carbs, fats, steps_uk, image, rating, votes FROM recipes ORDER BY rowid')
+            for row in cur:
+                yield self._recipe(row)
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _recipe(row) -> Recipe:
+        rid, name, tags, ingredients, cal, prot, carbs, fats, steps, image, rating, votes = row
+        return Recipe(rid, name or '', json.loads(tags or '[]'), json.loads(ingredients or '{}'),
+                      Nutrition(cal or 0, prot or 0, carbs or 0, fats or 0),
+                      json.loads(steps or '[]'), image or '', rating=rating or 0.0, votes=votes or 0)
+
+
+def write_jsonl_catalog(recipes: Iterable[Recipe], path: str) -> int:
+    count = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        for r in recipes:
+            f.write(json.dumps(recipe_to_dict(r), ensure_ascii=False) + '\n')
+            count += 1
+    return count
+
+
+def write_sqlite_catalog(recipes: Iterable[Recipe], path: str) -> int:
+    import sqlite3
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute('DROP TABLE IF EXISTS recipes')
+        conn.execute('CREATE TABLE recipes (id TEXT PRIMARY KEY, name_uk TEXT, tags TEXT, ingredients TEXT, '
+                     'calories REAL, protein REAL, carbs REAL, fats REAL, steps_uk TEXT, image TEXT, '
+                     'rating REAL DEFAULT 0, votes INTEGER DEFAULT 0)')
+        rows = ((r.id, r.name_uk, json.dumps(r.tags, ensure_ascii=False), json.dumps(r.ingredients, ensure_ascii=False),
+                 r.nutrition.calories, r.nutrition.protein, r.nutrition.carbs, r.nutrition.fats,
+                 json.dumps(r.steps_uk, ensure_ascii=False), r.image, r.rating, r.votes) for r in recipes)
+        cur = conn.executemany('INSERT INTO recipes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+        conn.commit()
+        return cur.rowcount
+    finally:
+        conn.close()
+
+
+def catalog_loader(path: str) -> CatalogLoader:
+    """Pick a loader backend from the file extension."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext in ('.jsonl', '.ndjson'):
+        return JsonlCatalogLoader(path)
+    if ext in ('.db', '.sqlite', '.sqlite3'):
+        return SqliteCatalogLoader(path)
+    if ext == BINARY_CATALOG_EXT:
+        return BinaryCatalogReader(path)
+    raise ValueError(f"unsupported catalog format: {path}")
+
+
 def load_sample_recipes():
     global RECIPES
     if RECIPES:
         return
-    
-    # Використовуємо pollination.ai для точної генерації страв.
-    # seed додається для стабільності картинки (щоб не змінювалась при оновленні).
-    base_img_url = "https://image.pollinations.ai/prompt/delicious%20food%20photorealistic%20"
-
-    RECIPES = [
-        # --- ORIGINAL RECIPES (20) ---
-        Recipe('r001', 'Йогурт з ягодами і гранолою', ['breakfast', 'light', 'sweet'],
-               {'йогурт грецький (200г)': 200, 'ягоди (100г)': 100, 'гранола (30г)': 30, 'мед (10г)': 10},
-               Nutrition(330, 20, 35, 10),
-               [
-                   'Покласти йогурт у миску.',
-                   'Промити та підсушити ягоди, додати зверху.',
-                   'Посипати гранолою, полити медом.',
-                   'Злегка перемішати і подати.'
-               ],
-               image=base_img_url + 'greek%20yogurt%20bowl%20with%20fresh%20berries%20and%20granola?width=400&height=300&nologo=true&seed=1'),
-        Recipe('r002', 'Омлет з овочами', ['breakfast', 'high-protein'],
-               {'яйця (2 шт)': 2, 'кабачок (80г)': 80, 'помідор (50г)': 50, 'олія (5мл)': 5},
-               Nutrition(300, 18, 6, 20),
-               [
-                   'Натерти кабачок, віджати вологу.',
-                   'Збити яйця, додати кабачок та дрібно порізаний помідор.',
-                   'Посмажити на невеликій кількості олії до готовності.'
-               ],
-               image=base_img_url + 'omelet%20with%20zucchini%20and%20tomatoes?width=400&height=300&nologo=true&seed=2'),
-        Recipe('r003', 'Авокадо-тост з яйцем', ['breakfast', 'light'],
-               {'авокадо (1/2)': 0.5, 'хліб цільнозерновий (1 слайс)': 1, 'яйце (1 шт)': 1},
-               Nutrition(310, 13, 26, 18),
-               [
-                   'Підсмажити хліб.',
-                   'Розім\'яти авокадо з лимонним соком і сіллю.',
-                   'Покласти авокадо на тост, додати яйце пашот зверху.'
-               ],
-               image=base_img_url + 'avocado%20toast%20with%20poached%20egg?width=400&height=300&nologo=true&seed=3'),
-        # --- bowls / smoothie / drinks / snacks / sweet
-        Recipe('r010', 'Смузі боул з манго', ['breakfast', 'sweet', 'drink'],
-               {'манго (150г)': 150, 'банан (50г)': 50, 'йогурт (120г)': 120, 'горіхи (10г)': 10},
-               Nutrition(350, 8, 60, 8),
-               [
-                   'Збити манго, банан і йогурт до кремової текстури.',
-                   'Викласти у миску, прикрасити горіхами та насінням.'
-               ],
-               image=base_img_url + 'mango%20smoothie%20bowl%20yellow?width=400&height=300&nologo=true&seed=10'),
-        Recipe('r011', 'Какао з мигдальним молоком', ['drink', 'sweet'],
-               {'мигдальне молоко (200мл)': 200, 'какао-порошок (10г)': 10, 'мед (10г)': 10},
-               Nutrition(200, 4, 28, 8),
-               [
-                   'Нагріти молоко, додати какао і мед, ретельно збити.',
-                   'Подавати гарячим.'
-               ],
-               image=base_img_url + 'hot%20cocoa%20drink%20in%20mug?width=400&height=300&nologo=true&seed=11'),
-        Recipe('r012', 'Протеїновий шейк', ['drink', 'high-protein'],
-               {'протеїн (30г)': 30, 'молоко/вода (250мл)': 250, 'банан (50г)': 50},
-               Nutrition(320, 28, 30, 6),
-               [
-                   'Змішати інгредієнти у шейкері або блендері.',
-                   'Пити відразу після приготування.'
-               ],
-               image=base_img_url + 'protein%20shake%20in%20glass%20with%20banana?width=400&height=300&nologo=true&seed=12'),
-        # --- lunch/dinner
-        Recipe('r020', 'Куряче філе з овочами', ['lunch', 'balanced'],
-               {'куряче філе (150г)': 150, 'броколі (120г)': 120, 'морква (80г)': 80, 'олія (10мл)': 10},
-               Nutrition(420, 38, 20, 18),
-               [
-                   'Порізати філе на шматки, посолити.',
-                   'Обсмажити на олії до золотистої скоринки.',
-                   'Додати овочі, накрити і тушкувати 8-10 хв.'
-               ],
-               image=base_img_url + 'fried%20chicken%20breast%20fillet%20with%20broccoli%20and%20carrots?width=400&height=300&nologo=true&seed=20'),
-        Recipe('r021', 'Сьомга з лимоном і кіноа', ['dinner', 'high-protein'],
-               {'сьомга (150г)': 150, 'кіноа (80г)': 80, 'лимон (30г)': 30},
-               Nutrition(560, 36, 48, 24),
-               [
-                   'Замаринувати сьомгу у лимонному соці, сіль, перець.',
-                   'Запекти 12-15 хв при 180°C.',
-                   'Паралельно зварити кіноа, подати разом.'
-               ],
-               image=base_img_url + 'baked%20salmon%20steak%20with%20quinoa%20and%20lemon?width=400&height=300&nologo=true&seed=21'),
-        # --- snacks
-        Recipe('r030', 'Хумус з овочами', ['snack', 'vegetarian'],
-               {'нут відварний (150г)': 150, 'тахіні (15г)': 15, 'олія (10мл)': 10, 'овочі (100г)': 100},
-               Nutrition(240, 8, 30, 10),
-               [
-                   'Змішати нут з тахіні, олією і лимоном в блендері до однорідності.',
-                   'Подавати з нарізаними овочами.'
-               ],
-               image=base_img_url + 'hummus%20bowl%20with%20carrot%20sticks?width=400&height=300&nologo=true&seed=30'),
-        # --- more items
-        Recipe('r040', 'Паста карбонара (полегшена)', ['lunch', 'comfort'],
-               {'спагеті (80г)': 80, 'бекон (30г)': 30, 'яйце (1 шт)': 1, 'пармезан (20г)': 20},
-               Nutrition(520, 22, 61, 20),
-               [
-                   'Зварити пасту до al dente.',
-                   'Обсмажити бекон до хрусткого стану.',
-                   'Змішати пасту з яйцем та сиром швидко, поки яйце не згорнулося.'
-               ],
-               image=base_img_url + 'pasta%20carbonara%20spaghetti?width=400&height=300&nologo=true&seed=40'),
-        Recipe('r041', 'Панкейки на кефірі', ['breakfast', 'sweet'],
-               {'борошно (100г)': 100, 'кефір (150мл)': 150, 'яйце (1 шт)': 1},
-               Nutrition(420, 10, 60, 12),
-               [
-                   'Змішати інгредієнти до гладкого тіста.',
-                   'Смажити на сковороді до золотистого кольору.'
-               ],
-               image=base_img_url + 'fluffy%20pancakes%20stack?width=400&height=300&nologo=true&seed=41'),
-        Recipe('r042', 'Суп-пюре з гарбуза', ['lunch', 'vegetarian', 'light'],
-               {'гарбуз (400г)': 400, 'цибуля (50г)': 50, 'вода (500мл)': 500},
-               Nutrition(180, 3, 30, 6),
-               [
-                   'Обсмажити цибулю, додати гарбуз і воду, варити до м\'якості.',
-                   'Пропюрирувати блендером і додати спеції.'
-               ],
-               image=base_img_url + 'pumpkin%20cream%20soup%20orange?width=400&height=300&nologo=true&seed=42'),
-        Recipe('r043', 'Кесаділья з куркою', ['lunch', 'comfort'],
-               {'тортилья (1 шт)': 1, 'курка (80г)': 80, 'сир (60г)': 60},
-               Nutrition(560, 32, 40, 28),
-               [
-                   'Обсмажити курку з приправами, покласти на тортилью з сиром.',
-                   'Скласти і обсмажити до рум\'янцю.'
-               ],
-               image=base_img_url + 'chicken%20quesadilla%20mexican?width=400&height=300&nologo=true&seed=43'),
-        Recipe('r044', 'Запечені яблука з медом', ['dessert', 'sweet'],
-               {'яблука (2 шт)': 2, 'мед (20г)': 20, 'горіхи (20г)': 20},
-               Nutrition(280, 4, 48, 8),
-               [
-                   'Вирізати серцевину яблук, заповнити медом і горіхами.',
-                   'Запікати 20-25 хв при 180°C.'
-               ],
-               image=base_img_url + 'baked%20apples%20with%20honey%20and%20nuts?width=400&height=300&nologo=true&seed=44'),
-        Recipe('r045', 'Теплий шоколадний напій', ['drink', 'sweet'],
-               {'молоко (200мл)': 200, 'какао (15г)': 15, 'цукор (10г)': 10},
-               Nutrition(260, 8, 28, 12),
-               [
-                   'Підігріти молоко, додати какао, добре розмішати.',
-                   'Подати гарячим з невеликою кількістю збитих вершків за бажанням.'
-               ],
-               image=base_img_url + 'hot%20chocolate%20drink?width=400&height=300&nologo=true&seed=45'),
-        Recipe('r046', 'Запечена курка з картоплею', ['dinner', 'hearty'],
-               {'курка (200г)': 200, 'картопля (200г)': 200, 'олія (10мл)': 10},
-               Nutrition(740, 48, 60, 28),
-               [
-                   'Приправити курку, розкласти з картоплею на деко, запікати 40-50 хв при 180°C.'
-               ],
-               image=base_img_url + 'roasted%20chicken%20legs%20with%20potatoes?width=400&height=300&nologo=true&seed=46'),
-        Recipe('r047', 'Боул з кіноа і овочами', ['lunch', 'bowl', 'vegetarian'],
-               {'кіноа (80г)': 80, 'авокадо (1/2)': 0.5, 'овочі (120г)': 120},
-               Nutrition(420, 12, 48, 18),
-               [
-                   'Зварити кіноа, змішати з овочами та авокадо, заправити соусом.'
-               ],
-               image=base_img_url + 'quinoa%20bowl%20avocado%20vegetables?width=400&height=300&nologo=true&seed=47'),
-        Recipe('r048', 'Енергетичний батончик домашній', ['snack', 'sweet'],
-               {'горіхи (50г)': 50, 'фініки (100г)': 100, 'вівсянка (40г)': 40},
-               Nutrition(320, 8, 40, 14),
-               [
-                   'Подрібнити інгредієнти в блендері, сформувати батончики, охолодити.'
-               ],
-               image=base_img_url + 'granola%20energy%20bar%20nuts%20dates?width=400&height=300&nologo=true&seed=48'),
-        Recipe('r049', 'Том-ям (легкий)', ['dinner', 'light'],
-               {'креветки (120г)': 120, 'бульйон (400мл)': 400, 'лимон (20г)': 20},
-               Nutrition(220, 18, 10, 8),
-               [
-                   'Закип\'ятити бульйон, додати креветки та спеції, довести до готовності.'
-               ],
-               image=base_img_url + 'tom%20yam%20soup%20shrimp?width=400&height=300&nologo=true&seed=49'),
-        Recipe('r050', 'Крем-брюле (полегшений)', ['dessert', 'sweet'],
-               {'жовтки (2 шт)': 2, 'молоко (200мл)': 200, 'цукор (15г)': 15},
-               Nutrition(380, 8, 38, 22),
-               [
-                   'Змішати жовтки з молоком і цукром, випікати на водяній бані 30 хв при 150°C.'
-               ],
-               image=base_img_url + 'creme%20brulee%20dessert?width=400&height=300&nologo=true&seed=50'),
-
-        # --- NEW RECIPES (50) ---
-        # 1. New Breakfast Recipes
-        Recipe('r051', 'Вівсянка на воді з яблуком і корицею', ['breakfast', 'light', 'vegetarian'],
-               {'вівсяні пластівці (50г)': 50, 'вода (200мл)': 200, 'яблуко (100г)': 100, 'кориця': 1},
-               Nutrition(280, 8, 45, 6),
-               [
-                   'Зварити вівсянку на воді до готовності.',
-                   'Додати нарізане кубиками яблуко і посипати корицею.'
-               ],
-               image=base_img_url + 'oatmeal%20porridge%20with%20apple%20and%20cinnamon?width=400&height=300&nologo=true&seed=51'),
-        Recipe('r052', 'Сирники запечені з родзинками', ['breakfast', 'sweet', 'high-protein'],
-               {'сир кисломолочний (200г)': 200, 'яйце (1 шт)': 1, 'борошно (10г)': 10, 'родзинки (10г)': 10},
-               Nutrition(340, 25, 30, 12),
-               [
-                   'Змішати сир, яйце, борошно та родзинки.',
-                   'Сформувати сирники, запекти в духовці при 180°C близько 20 хв.'
-               ],
-               image=base_img_url + 'ukrainian%20syrniki%20cottage%20cheese%20pancakes%20raisins?width=400&height=300&nologo=true&seed=52'),
-        Recipe('r053', 'Яєчня з грибами та шпинатом', ['breakfast', 'high-protein'],
-               {'яйця (3 шт)': 3, 'печериці (100г)': 100, 'шпинат (50г)': 50, 'олія (5мл)': 5},
-               Nutrition(310, 20, 5, 23),
-               [
-                   'Обсмажити на сковороді гриби та шпинат.',
-                   'Додати збиті яйця, готувати до готовності.'
-               ],
-               image=base_img_url + 'scrambled%20eggs%20with%20spinach%20and%20mushrooms?width=400&height=300&nologo=true&seed=53'),
-        Recipe('r054', 'Тост з арахісовою пастою та бананом', ['breakfast', 'hearty', 'sweet'],
-               {'хліб цільнозерновий (2 слайси)': 2, 'арахісова паста (30г)': 30, 'банан (50г)': 50},
-               Nutrition(380, 14, 35, 20),
-               [
-                   'Підсмажити хліб.',
-                   'Намазати арахісову пасту, покласти кружальця банана.'
-               ],
-               image=base_img_url + 'toast%20with%20peanut%20butter%20and%20banana%20slices?width=400&height=300&nologo=true&seed=54'),
-        Recipe('r055', 'Чиа пудинг на кокосовому молоці', ['breakfast', 'light', 'drink'],
-               {'насіння чіа (30г)': 30, 'кокосове молоко (200мл)': 200, 'мед (10г)': 10, 'ягоди (30г)': 30},
-               Nutrition(320, 10, 38, 15),
-               [
-                   'Змішати чіа, молоко та мед. Залишити на ніч у холодильнику.',
-                   'Вранці додати свіжі ягоди.'
-               ],
-               image=base_img_url + 'chia%20pudding%20glass%20berries?width=400&height=300&nologo=true&seed=55'),
-        Recipe('r056', 'Боул з гречки та свіжих овочів', ['breakfast', 'vegetarian', 'balanced'],
-               {'гречка відварна (150г)': 150, 'огірок (50г)': 50, 'помідор (50г)': 50, 'зелень': 5},
-               Nutrition(360, 10, 60, 8),
-               [
-                   'Змішати теплу гречку з нарізаними овочами.',
-                   'Заправити невеликою кількістю олії та зеленню.'
-               ],
-               image=base_img_url + 'buckwheat%20porridge%20bowl%20with%20cucumber%20and%20tomato?width=400&height=300&nologo=true&seed=56'),
-        Recipe('r057', 'Фріттата з куркою і сиром', ['breakfast', 'high-protein', 'hearty'],
-               {'яйця (3 шт)': 3, 'куряче філе відварне (50г)': 50, 'сир твердий (30г)': 30, 'молоко (30мл)': 30},
-               Nutrition(410, 35, 8, 25),
-               [
-                   'Змішати збиті яйця, молоко, нарізану курку та натертий сир.',
-                   'Запекти в невеликій формі до готовності.'
-               ],
-               image=base_img_url + 'baked%20frittata%20egg%20casserole?width=400&height=300&nologo=true&seed=57'),
-        Recipe('r058', 'Шоколадна вівсянка (за ніч)', ['breakfast', 'sweet'],
-               {'вівсяні пластівці (50г)': 50, 'молоко (150мл)': 150, 'какао (5г)': 5, 'банан (50г)': 50},
-               Nutrition(350, 12, 50, 12),
-               [
-                   'Змішати пластівці, молоко та какао. Поставити на ніч у холодильник.',
-                   'Вранці додати нарізаний банан.'
-               ],
-               image=base_img_url + 'chocolate%20overnight%20oats%20jar?width=400&height=300&nologo=true&seed=58'),
-        Recipe('r059', 'Вафлі зі шпинатом та лососем', ['breakfast', 'light', 'high-protein'],
-               {'борошно (50г)': 50, 'молоко (100мл)': 100, 'шпинат (50г)': 50, 'лосось слабосолений (30г)': 30},
-               Nutrition(390, 28, 35, 16),
-               [
-                   'Приготувати тісто, додавши шпинат. Випекти вафлі.',
-                   'Подавати зі шматочками лосося.'
-               ],
-               image=base_img_url + 'green%20spinach%20waffles%20with%20salmon?width=400&height=300&nologo=true&seed=59'),
-        Recipe('r060', 'Сендвіч з індичкою та авокадо', ['breakfast', 'balanced'],
-               {'хліб (2 слайси)': 2, 'філе індички (50г)': 50, 'авокадо (30г)': 30, 'салат': 1},
-               Nutrition(370, 25, 30, 17),
-               [
-                   'Підсмажити хліб. Зібрати сендвіч з авокадо, індичкою та салатом.'
-               ],
-               image=base_img_url + 'turkey%20avocado%20sandwich?width=400&height=300&nologo=true&seed=60'),
-        Recipe('r061', 'Протеїновий пудинг з кави', ['breakfast', 'drink', 'high-protein'],
-               {'протеїн кавовий (30г)': 30, 'вода/молоко (200мл)': 200, 'лід': 1},
-               Nutrition(220, 25, 15, 6),
-               [
-                   'Змішати всі інгредієнти у шейкері або блендері.',
-                   'Подавати холодним з льодом.'
-               ],
-               image=base_img_url + 'iced%20coffee%20protein%20shake?width=400&height=300&nologo=true&seed=61'),
-        Recipe('r062', 'Рисова каша на молоці з корицею', ['breakfast', 'sweet', 'comfort'],
-               {'рис (60г)': 60, 'молоко (250мл)': 250, 'цукор (10г)': 10, 'кориця': 1},
-               Nutrition(360, 10, 65, 7),
-               [
-                   'Зварити рис на молоці до готовності.',
-                   'Додати цукор і корицю за смаком, перемішати.'
-               ],
-               image=base_img_url + 'rice%20pudding%20with%20cinnamon?width=400&height=300&nologo=true&seed=62'),
-        Recipe('r063', 'Омлет у лаваші з сиром', ['breakfast', 'hearty'],
-               {'лаваш тонкий (50г)': 50, 'яйця (2 шт)': 2, 'сир твердий (30г)': 30},
-               Nutrition(380, 22, 30, 20),
-               [
-                   'Приготувати омлет.',
-                   'Загорнути омлет та натертий сир у лаваш і прогріти на сковороді.'
-               ],
-               image=base_img_url + 'omelet%20cheese%20wrap%20lavash?width=400&height=300&nologo=true&seed=63'),
-        Recipe('r064', 'Фруктовий салат з йогуртом', ['breakfast', 'light', 'sweet'],
-               {'йогурт натуральний (150г)': 150, 'банан (50г)': 50, 'ківі (50г)': 50, 'апельсин (50г)': 50},
-               Nutrition(290, 10, 45, 8),
-               [
-                   'Нарізати фрукти.',
-                   'Змішати з йогуртом.'
-               ],
-               image=base_img_url + 'fruit%20salad%20bowl%20yogurt?width=400&height=300&nologo=true&seed=64'),
-        Recipe('r065', 'Гречана каша з кефіром (за ніч)', ['breakfast', 'light', 'balanced'],
-               {'гречка (50г)': 50, 'кефір (200мл)': 200, 'насіння льону (5г)': 5},
-               Nutrition(270, 12, 40, 7),
-               [
-                   'Залити гречку кефіром на ніч.',
-                   'Додати насіння льону перед вживанням.'
-               ],
-               image=base_img_url + 'buckwheat%20with%20kefir%20healthy?width=400&height=300&nologo=true&seed=65'),
-
-        # 2. New Lunch Recipes
-        Recipe('r066', 'Сочевиця з овочами та тофу', ['lunch', 'vegetarian', 'balanced'],
-               {'сочевиця відварна (150г)': 150, 'тофу (80г)': 80, 'морква (50г)': 50, 'цибуля (50г)': 50},
-               Nutrition(450, 25, 55, 15),
-               [
-                   'Обсмажити овочі, додати сочевицю та нарізаний тофу.',
-                   'Тушкувати 10 хв, додати спеції.'
-               ],
-               image=base_img_url + 'lentils%20stew%20with%20tofu%20vegetables?width=400&height=300&nologo=true&seed=66'),
-        Recipe('r067', 'Кус-кус з тунцем та огірком', ['lunch', 'light', 'high-protein'],
-               {'kus-kus (60g)': 60, 'тунець консервований (100г)': 100, 'огірок (80г)': 80, 'олія (5мл)': 5},
-               Nutrition(410, 30, 45, 12),
-               [
-                   'Запарити кус-кус.',
-                   'Змішати з тунцем, нарізаним огірком та олією.'
-               ],
-               image=base_img_url + 'couscous%20salad%20with%20tuna?width=400&height=300&nologo=true&seed=67'),
-        Recipe('r068', 'Салат Цезар (полегшений)', ['lunch', 'high-protein', 'light'],
-               {'куряче філе (100г)': 100, 'салат ромен': 50, 'помідори чері (50г)': 50, 'соус Цезар (20г)': 20},
-               Nutrition(390, 30, 15, 22),
-               [
-                   'Нарізати овочі, додати нарізану запечену курку.',
-                   'Заправити легким соусом Цезар.'
-               ],
-               image=base_img_url + 'caesar%20salad%20chicken?width=400&height=300&nologo=true&seed=68'),
-        Recipe('r069', 'Овочевий суп-пюре з броколі', ['lunch', 'light', 'vegetarian'],
-               {'броколі (150г)': 150, 'картопля (50г)': 50, 'цибуля (30г)': 30, 'хліб для грінок (30г)': 30},
-               Nutrition(250, 8, 35, 8),
-               [
-                   'Зварити овочі до м\'якості.',
-                   'Пюрувати блендером, подати з підсушеними грінками.'
-               ],
-               image=base_img_url + 'green%20broccoli%20cream%20soup?width=400&height=300&nologo=true&seed=69'),
-        Recipe('r070', 'Плов з куркою та морквою', ['lunch', 'hearty', 'balanced'],
-               {'рис (100г)': 100, 'курка (100г)': 100, 'морква (80г)': 80, 'олія (15мл)': 15},
-               Nutrition(620, 35, 80, 20),
-               [
-                   'Обсмажити курку та овочі. Додати рис та воду.',
-                   'Готувати під кришкою до готовності рису.'
-               ],
-               image=base_img_url + 'pilaf%20rice%20chicken%20carrot?width=400&height=300&nologo=true&seed=70'),
-        Recipe('r071', 'Буріто боул з яловичиною', ['lunch', 'high-protein', 'comfort'],
-               {'яловичина відварна (100г)': 100, 'рис (80г)': 80, 'квасоля (50г)': 50, 'кукурудза (30г)': 30},
-               Nutrition(550, 40, 50, 20),
-               [
-                   'Змішати всі інгредієнти в мисці.',
-                   'Заправити легким соусом або олією та спеціями.'
-               ],
-               image=base_img_url + 'burrito%20bowl%20beef%20beans%20corn?width=400&height=300&nologo=true&seed=71'),
-        Recipe('r072', 'Паста з томатним соусом та базиліком', ['lunch', 'comfort', 'vegetarian'],
-               {'спагеті (100г)': 100, 'томати протерті (150г)': 150, 'базилік': 5, 'олія (5мл)': 5},
-               Nutrition(480, 15, 80, 10),
-               [
-                   'Зварити пасту до стану al dente.',
-                   'Змішати з гарячим томатним соусом та свіжим базиліком.'
-               ],
-               image=base_img_url + 'spaghetti%20pasta%20tomato%20sauce%20basil?width=400&height=300&nologo=true&seed=72'),
-        Recipe('r073', 'Деруни з нежирною сметаною', ['lunch', 'comfort', 'hearty'],
-               {'картопля (200г)': 200, 'яйце (1 шт)': 1, 'борошно (10г)': 10, 'сметана (50г)': 50},
-               Nutrition(510, 10, 60, 25),
-               [
-                   'Натерти картоплю, змішати з яйцем та борошном.',
-                   'Посмажити деруни. Подати з нежирною сметаною.'
-               ],
-               image=base_img_url + 'potato%20pancakes%20sour%20cream?width=400&height=300&nologo=true&seed=73'),
-        Recipe('r074', 'Капусняк з грибами', ['lunch', 'vegetarian', 'light'],
-               {'квашена капуста (150г)': 150, 'гриби (80г)': 80, 'картопля (50г)': 50, 'вода (500мл)': 500},
-               Nutrition(300, 10, 40, 10),
-               [
-                   'Зварити легкий суп з капусти, грибів та картоплі.',
-                   'Подавати гарячим, можна додати зелень.'
-               ],
-               image=base_img_url + 'sauerkraut%20soup%20mushrooms?width=400&height=300&nologo=true&seed=74'),
-        Recipe('r075', 'Теплий салат з кіноа та креветками', ['lunch', 'high-protein', 'light'],
-               {'кіноа (60г)': 60, 'креветки (100г)': 100, 'авокадо (30г)': 30, 'рукола': 30},
-               Nutrition(430, 35, 40, 15),
-               [
-                   'Зварити кіноа, обсмажити креветки.',
-                   'Змішати теплу кіноа, креветки, нарізане авокадо та руколу.'
-               ],
-               image=base_img_url + 'quinoa%20salad%20shrimp%20avocado?width=400&height=300&nologo=true&seed=75'),
-        Recipe('r076', 'Котлети з індички з овочевим пюре', ['lunch', 'high-protein', 'balanced'],
-               {'фарш індички (120г)': 120, 'картопля (100г)': 100, 'броколі (50г)': 50, 'морква (50г)': 50},
-               Nutrition(490, 40, 45, 18),
-               [
-                   'Приготувати котлети з фаршу на пару або запекти.',
-                   'Зробити пюре з картоплі, броколі та моркви.'
-               ],
-               image=base_img_url + 'turkey%20meatballs%20mashed%20potatoes?width=400&height=300&nologo=true&seed=76'),
-        Recipe('r077', 'Булгур з куркою та соусом теріякі', ['lunch', 'comfort', 'balanced'],
-               {'булгур (80г)': 80, 'курка (100г)': 100, 'соус теріякі (20г)': 20, 'перець болгарський (50г)': 50},
-               Nutrition(560, 38, 65, 18),
-               [
-                   'Відварити булгур.',
-                   'Обсмажити курку з перцем і соусом теріякі. Змішати з булгуром.'
-               ],
-               image=base_img_url + 'bulgur%20chicken%20teriyaki?width=400&height=300&nologo=true&seed=77'),
-        Recipe('r078', 'Суп Мінестроне', ['lunch', 'light', 'vegetarian'],
-               {'квасоля (50г)': 50, 'макарони дрібні (30г)': 30, 'томати (100г)': 100, 'кабачок (50г)': 50, 'бульйон': 400},
-               Nutrition(280, 8, 45, 8),
-               [
-                   'Зварити овочі та квасолю у бульйоні, додати дрібні макарони.',
-                   'Подавати зі свіжим базиліком.'
-               ],
-               image=base_img_url + 'minestrone%20soup%20vegetables?width=400&height=300&nologo=true&seed=78'),
-        Recipe('r079', 'Запечена риба (тріска) з травами', ['lunch', 'high-protein', 'light'],
-               {'тріска філе (150г)': 150, 'трави, лимон': 10, 'олія (10мл)': 10},
-               Nutrition(380, 35, 10, 22),
-               [
-                   'Запекти філе тріски з лимоном та травами 15 хв при 180°C.'
-               ],
-               image=base_img_url + 'baked%20cod%20fish%20lemon%20herbs?width=400&height=300&nologo=true&seed=79'),
-        Recipe('r080', 'Міні-піца на цільнозерновому тісті', ['lunch', 'comfort', 'balanced'],
-               {'тісто цільнозернове (100г)': 100, 'томатний соус (30г)': 30, 'сир моцарела (50г)': 50, 'печериці (30г)': 30},
-               Nutrition(520, 25, 60, 20),
-               [
-                   'Сформувати міні-піцу. Додати соус, сир та печериці.',
-                   'Запекти до рум\'янцю.'
-               ],
-               image=base_img_url + 'mini%20pizza%20mushrooms?width=400&height=300&nologo=true&seed=80'),
-
-        # 3. New Dinner Recipes
-        Recipe('r081', 'Гречка з курячими сердечками', ['dinner', 'hearty', 'high-protein'],
-               {'гречка (80г)': 80, 'курячі сердечка (120г)': 120, 'цибуля (30г)': 30, 'сметана нежирна (20г)': 20},
-               Nutrition(480, 35, 45, 18),
-               [
-                   'Відварити гречку.',
-                   'Сердечка потушкувати з цибулею та нежирною сметаною.'
-               ],
-               image=base_img_url + 'buckwheat%20porridge%20stewed%20chicken%20hearts?width=400&height=300&nologo=true&seed=81'),
-        Recipe('r082', 'Запечений батат з сиром фета', ['dinner', 'vegetarian', 'balanced'],
-               {'батат (200г)': 200, 'сир фета (30г)': 30, 'олія (5мл)': 5, 'спеції': 5},
-               Nutrition(410, 12, 55, 16),
-               [
-                   'Нарізати батат, запекти до м\'якості.',
-                   'Посипати сиром фета та спеціями.'
-               ],
-               image=base_img_url + 'baked%20sweet%20potato%20feta%20cheese?width=400&height=300&nologo=true&seed=82'),
-        Recipe('r083', 'Хек тушкований з овочами', ['dinner', 'high-protein', 'light'],
-               {'хек філе (150г)': 150, 'морква (50г)': 50, 'помідори (50г)': 50, 'цибуля (30г)': 30},
-               Nutrition(320, 30, 15, 14),
-               [
-                   'Нарізати овочі та тушкувати їх.',
-                   'Додати філе хека і тушкувати до готовності риби.'
-               ],
-               image=base_img_url + 'stewed%20white%20fish%20vegetables?width=400&height=300&nologo=true&seed=83'),
-        Recipe('r084', 'Рататуй з яйцем пашот', ['dinner', 'light', 'vegetarian'],
-               {'кабачок (100г)': 100, 'баклажан (100г)': 100, 'томати (100г)': 100, 'яйце (1 шт)': 1},
-               Nutrition(300, 15, 25, 15),
-               [
-                   'Нарізати та запекти овочі.',
-                   'Подати з яйцем пашот зверху.'
-               ],
-               image=base_img_url + 'ratatouille%20vegetables%20poached%20egg?width=400&height=300&nologo=true&seed=84'),
-        Recipe('r085', 'Стейк з індички з зеленим салатом', ['dinner', 'high-protein', 'light'],
-               {'стейк індички (150г)': 150, 'салат зелений (100г)': 100, 'олія для салату (10мл)': 10},
-               Nutrition(420, 45, 10, 22),
-               [
-                   'Обсмажити або запекти стейк індички.',
-                   'Подати з легким зеленим салатом, заправленим олією.'
-               ],
-               image=base_img_url + 'turkey%20steak%20green%20salad?width=400&height=300&nologo=true&seed=85'),
-        Recipe('r086', 'Запіканка з макаронів та сиру', ['dinner', 'comfort', 'hearty'],
-               {'макарони (100г)': 100, 'сир твердий (50г)': 50, 'молоко (50мл)': 50, 'яйце (1 шт)': 1},
-               Nutrition(580, 30, 65, 25),
-               [
-                   'Зварити макарони. Змішати з сиром, яйцем та молоком.',
-                   'Запекти в духовці до золотистої скоринки.'
-               ],
-               image=base_img_url + 'macaroni%20cheese%20casserole?width=400&height=300&nologo=true&seed=86'),
-        Recipe('r087', 'Форель запечена з броколі', ['dinner', 'high-protein', 'balanced'],
-               {'форель філе (120г)': 120, 'броколі (150г)': 150, 'олія (10мл)': 10},
-               Nutrition(490, 38, 20, 28),
-               [
-                   'Запекти філе форелі та броколі разом при 180°C 15-20 хв.'
-               ],
-               image=base_img_url + 'baked%20trout%20fish%20broccoli?width=400&height=300&nologo=true&seed=87'),
-        Recipe('r088', 'Овочеве карі з нутом', ['dinner', 'vegetarian', 'comfort'],
-               {'нут консервований (100г)': 100, 'кокосове молоко (100мл)': 100, 'каррі паста (10г)': 10, 'овочі мікс (100г)': 100},
-               Nutrition(450, 15, 60, 18),
-               [
-                   'Тушкувати нут та овочі у кокосовому молоці з додаванням пасти каррі.'
-               ],
-               image=base_img_url + 'chickpea%20vegetable%20curry?width=400&height=300&nologo=true&seed=88'),
-        Recipe('r089', 'Бургер з котлетою з червоної сочевиці', ['dinner', 'vegetarian', 'comfort'],
-               {'булочка цільнозернова (70г)': 70, 'котлета сочевична (100г)': 100, 'сир (20г)': 20, 'салат': 10},
-               Nutrition(540, 20, 60, 25),
-               [
-                   'Приготувати котлету. Скласти бургер з овочами та сиром.'
-               ],
-               image=base_img_url + 'vegetarian%20burger%20lentil%20patty?width=400&height=300&nologo=true&seed=89'),
-        Recipe('r090', 'Картопляне пюре з курячими тефтелями', ['dinner', 'hearty', 'comfort'],
-               {'картопля (200г)': 200, 'фарш курячий (100г)': 100, 'молоко (50мл)': 50, 'олія (10мл)': 10},
-               Nutrition(600, 35, 60, 25),
-               [
-                   'Зробити тефтелі на пару або запекти.',
-                   'Зварити картопляне пюре з молоком та олією.'
-               ],
-               image=base_img_url + 'mashed%20potatoes%20meatballs?width=400&height=300&nologo=true&seed=90'),
-        Recipe('r091', 'Салат з квасолею та курячим філе', ['dinner', 'high-protein', 'balanced'],
-               {'куряче філе (100г)': 100, 'квасоля консервована (100г)': 100, 'перець болгарський (50г)': 50, 'олія': 5},
-               Nutrition(410, 40, 35, 14),
-               [
-                   'Змішати нарізане філе, квасолю та перець.',
-                   'Заправити олією та спеціями.'
-               ],
-               image=base_img_url + 'chicken%20bean%20salad?width=400&height=300&nologo=true&seed=91'),
-        Recipe('r092', 'Голубці ліниві', ['dinner', 'comfort', 'balanced'],
-               {'фарш яловичий (100г)': 100, 'капуста (100г)': 100, 'рис (50г)': 50, 'томатний соус': 50},
-               Nutrition(480, 30, 50, 20),
-               [
-                   'Змішати фарш, нарізану капусту та відварений рис.',
-                   'Сформувати, потушкувати у томатному соусі.'
-               ],
-               image=base_img_url + 'cabbage%20rolls%20stew%20tomato?width=400&height=300&nologo=true&seed=92'),
-        Recipe('r093', 'Овочі-гриль з хумусом', ['dinner', 'light', 'vegetarian'],
-               {'кабачок (100г)': 100, 'перець (100г)': 100, 'хумус (50г)': 50, 'баклажан (50г)': 50},
-               Nutrition(350, 10, 40, 18),
-               [
-                   'Нарізати овочі та обсмажити на грилі.',
-                   'Подати з хумусом.'
-               ],
-               image=base_img_url + 'grilled%20vegetables%20hummus?width=400&height=300&nologo=true&seed=93'),
-        Recipe('r094', 'Яловичина тушкована з чорносливом', ['dinner', 'hearty', 'high-protein'],
-               {'яловичина (120г)': 120, 'чорнослив (30г)': 30, 'рис (70г)': 70},
-               Nutrition(520, 40, 50, 20),
-               [
-                   'Тушкувати яловичину з чорносливом та спеціями.',
-                   'Подати з відвареним рисом.'
-               ],
-               image=base_img_url + 'beef%20stew%20prunes%20rice?width=400&height=300&nologo=true&seed=94'),
-        Recipe('r095', 'Крем-суп з гарбуза та імбиру', ['dinner', 'light', 'vegetarian'],
-               {'гарбуз (300г)': 300, 'імбир (10г)': 10, 'бульйон овочевий (300мл)': 300},
-               Nutrition(200, 5, 30, 5),
-               [
-                   'Зварити гарбуз з імбиром у бульйоні.',
-                   'Пропюрувати блендером.'
-               ],
-               image=base_img_url + 'pumpkin%20ginger%20soup?width=400&height=300&nologo=true&seed=95'),
-
-        # 4. New Snacks/Drinks/Desserts
-        Recipe('r096', 'Фруктове морозиво (банан/ягоди)', ['dessert', 'sweet', 'light'],
-               {'банан заморожений (100г)': 100, 'ягоди заморожені (50г)': 50, 'йогурт (20г)': 20},
-               Nutrition(180, 3, 35, 3),
-               [
-                   'Збити всі заморожені інгредієнти у блендері до консистенції морозива.',
-                   'Подавати негайно.'
-               ],
-               image=base_img_url + 'fruit%20ice%20cream%20sorbet%20berries?width=400&height=300&nologo=true&seed=96'),
-        Recipe('r097', 'Овочеві палички з йогуртовим соусом', ['snack', 'light', 'vegetarian'],
-               {'морква (50г)': 50, 'селера (50г)': 50, 'йогурт грецький (50г)': 50, 'спеції': 2},
-               Nutrition(150, 8, 15, 6),
-               [
-                   'Нарізати моркву та селеру паличками.',
-                   'Йогурт змішати зі спеціями для соусу.'
-               ],
-               image=base_img_url + 'vegetable%20sticks%20carrot%20celery%20dip?width=400&height=300&nologo=true&seed=97'),
-        Recipe('r098', 'Протеїновий батончик без випікання', ['snack', 'high-protein', 'sweet'],
-               {'протеїновий порошок (20г)': 20, 'вівсянка (30г)': 30, 'мед (15г)': 15, 'арахісова паста (10г)': 10},
-               Nutrition(260, 15, 30, 10),
-               [
-                   'Змішати всі інгредієнти.',
-                   'Сформувати батончики та охолодити у морозильній камері.'
-               ],
-               image=base_img_url + 'protein%20bar%20homemade?width=400&height=300&nologo=true&seed=98'),
-        Recipe('r099', 'Чай масала з мигдальним молоком', ['drink', 'sweet', 'comfort'],
-               {'мигдальне молоко (200мл)': 200, 'чай/спеції масала': 5, 'мед (10г)': 10},
-               Nutrition(120, 3, 20, 3),
-               [
-                   'Підігріти молоко, додати чай/спеції масала та мед.',
-                   'Настояти кілька хвилин, процідити.'
-               ],
-               image=base_img_url + 'masala%20chai%20tea%20spices?width=400&height=300&nologo=true&seed=99'),
-        Recipe('r100', 'Горіхово-фруктова суміш', ['snack', 'hearty', 'sweet'],
-               {'волоські горіхи (30г)': 30, 'родзинки (30г)': 30, 'курага (30г)': 30},
-               Nutrition(350, 10, 35, 20),
-               [
-                   'Змішати горіхи, родзинки та курагу.',
-                   'Зберігати у герметичному контейнері.'
-               ],
-               image=base_img_url + 'nuts%20dried%20fruits%20mix?width=400&height=300&nologo=true&seed=100'),
-    ]
+    RECIPES = list(JsonlCatalogLoader(SAMPLE_CATALOG_PATH).iter_recipes())
+
+
+# ----------------------------
+# Columnar recipe catalog
+# ----------------------------
+CATEGORY_TAGS = ('breakfast', 'lunch', 'snack', 'dinner')
+# share of the daily calorie target given to each meal
+MEAL_ALLOCATION = {'breakfast': 0.25, 'lunch': 0.35, 'snack': 0.1, 'dinner': 0.3}
+
+
+# loader-backed catalogs keep at most this many fetched Recipe objects
+FETCH_CACHE_SIZE = 4096
+
+
+class RecipeCatalog:
+    """Column-oriented copy of the recipe data that MenuPlanner scores against.
+
+    Built from a CatalogLoader it holds only the scoring columns and keeps fetched recipes in a bounded LRU.
+    """
+
+    def __init__(self, recipes: Optional[Iterable[Recipe]] = None, loader: Optional[CatalogLoader] = None):
+        self.ids: List[str] = []
+        self.index: Dict[str, int] = {}
+        # Recipe objects held in memory by row (added directly, never evicted)
+        self.rows: Dict[int, Recipe] = {}
+        self.loader = loader
+        # recipes fetched from the loader, least recently used first
+        self.fetched: OrderedDict = OrderedDict()
+        self.fetch_cache_size = FETCH_CACHE_SIZE
+        self._fetch_lock = threading.Lock()
+        self.locators = array('q')
+        self.calories = array('d')
+        self.protein = array('d')
+        self.carbs = array('d')
+        self.fats = array('d')
+        self.rating = array('d')
+        self.votes = array('l')
+        # up to 64 distinct tags fit into 'Q'; beyond that masks become plain ints
+        self.tag_masks = array('Q')
+        self.tag_bits: Dict[str, int] = {}
+        self.live = bytearray()
+        self.ingredient_text: List[str] = []
+        for tag in CATEGORY_TAGS:
+            self.tag_bit(tag)
+        for r in recipes or []:
+            self.add(r)
+        if loader is not None:
+            for summary in loader.iter_summaries():
+                self._append(summary.id, summary.tags, summary.ingredients_text, summary.nutrition,
+                             summary.rating, summary.votes, None, summary.locator)
+
+    @classmethod
+    def open(cls, path: str) -> 'RecipeCatalog':
+        if path.lower().endswith(BINARY_CATALOG_EXT):
+            return MmapCatalog(path)
+        return cls(loader=catalog_loader(path))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def live_rows(self) -> List[int]:
+        """Row numbers of recipes that have not been removed."""
+        return [i for i, alive in enumerate(self.live) if alive]
+
+    def tags_of(self, row: int) -> List[str]:
+        """Normalized tags of a row, decoded from its bitmask."""
+        mask = self.tag_masks[row]
+        return [t for t, bit in self.tag_bits.items() if mask >> bit & 1]
+
+    def tag_bit(self, tag: str) -> int:
+        """Return the bit assigned to a (lowercased) tag, allocating a new one if needed."""
+        bit = self.tag_bits.get(tag)
+        if bit is None:
+            bit = len(self.tag_bits)
+            self.tag_bits[tag] = bit
+            if bit >= 64 and isinstance(self.tag_masks, array):
+                self.tag_masks = list(self.tag_masks)
+        return bit
+
+    def mask_for(self, tags: Iterable[str]) -> int:
+        mask = 0
+        for t in tags:
+            mask |= 1 << self.tag_bit(t.lower())
+        return mask
+
+    def add(self, recipe: Recipe) -> int:
+        return self._append(recipe.id, recipe.tags, ingredient_text(recipe.ingredients), recipe.nutrition,
+                            recipe.rating, recipe.votes, recipe, -1)
+
+    def _append(self, recipe_id: str, tags: List[str], ingr_text: str, nut: Nutrition,
+                rating: float, votes: int, recipe: Optional[Recipe], locator: int) -> int:
+        if recipe_id in self.index:
+            raise ValueError(f"duplicate recipe id: {recipe_id}")
+        # may switch tag_masks to a list, so resolve it before appending
+        mask = self.mask_for(tags)
+        row = len(self.ids)
+        self.ids.append(recipe_id)
+        self.index[recipe_id] = row
+        if recipe is not None:
+            self.rows[row] = recipe
+        self.locators.append(locator)
+        self.calories.append(float(nut.calories))
+        self.protein.append(float(nut.protein))
+        self.carbs.append(float(nut.carbs))
+        self.fats.append(float(nut.fats))
+        self.rating.append(float(rating or 0))
+        self.votes.append(int(votes or 0))
+        self.tag_masks.append(mask)
+        self.ingredient_text.append(ingr_text)
+        self.live.append(1)
+        return row
+
+    def remove(self, recipe_id: str) -> Optional[int]:
+        """Tombstone a recipe; its row number is never reused."""
+        row = self.index.pop(recipe_id, None)
+        if row is not None:
+            self.live[row] = 0
+        return row
+
+    def recipe(self, row: int) -> Recipe:
+        recipe = self.rows.get(row)
+        if recipe is not None:
+            return recipe
+        with self._fetch_lock:
+            recipe = self.fetched.get(row)
+            if recipe is not None:
+                self.fetched.move_to_end(row)
+                return recipe
+        recipe = self.loader.fetch(self.locators[row])
+        # ratings may have changed since the source was written
+        recipe.rating = self.rating[row]
+        recipe.votes = self.votes[row]
+        with self._fetch_lock:
+            recipe = self.fetched.setdefault(row, recipe)
+            while len(self.fetched) > self.fetch_cache_size:
+                self.fetched.popitem(last=False)
+        return recipe
+
+    def set_rating(self, row: int, rating: float, votes: int):
+        self.rating[row] = float(rating or 0)
+        self.votes[row] = int(votes or 0)
+
+
+# ----------------------------
+# Binary (mmap) catalog
+# ----------------------------
+# Layout, little-endian, every section 8-byte aligned:
+#   header   magic, version, n, mask_words, field count, then section offsets
+#   tags     JSON list of normalized tags in bit order
+#   columns  calories/protein/carbs/fats/rating as f64[n], votes as i64[n]
+#   masks    u64[n * mask_words] tag bitsets
+#   id_order u32[n] rows sorted by id, for binary-search lookup
+#   offsets  u64[n * fields + 1] into the string blob
+#   blob     UTF-8 strings, BINARY_FIELDS per row
+BINARY_CATALOG_EXT = '.rcat'
+BINARY_MAGIC = b'RCAT\x00\x00\x00\x00'
+BINARY_VERSION = 1
+BINARY_FIELDS = ('id', 'name_uk', 'tags', 'ingredients', 'ingredients_text', 'steps_uk', 'image')
+BINARY_SECTIONS = ('tags', 'calories', 'protein', 'carbs', 'fats', 'rating', 'votes', 'masks', 'id_order', 'offsets', 'blob', 'end')
+_BINARY_HEADER = struct.Struct('<8sIIII')
+_BINARY_SECTIONS = struct.Struct('<%dQ' % len(BINARY_SECTIONS))
+
+
+def _pad8(f) -> None:
+    f.write(b'\0' * (-f.tell() % 8))
+
+
+def build_binary_catalog(recipes: Iterable[Recipe], path: str) -> int:
+    """Write recipes into the packed format read by MmapCatalog, spooling strings to a temporary file."""
+    import tempfile
+    tag_bits: Dict[str, int] = {}
+    for tag in CATEGORY_TAGS:
+        tag_bits[tag] = len(tag_bits)
+    cols = {name: array('d') for name in ('calories', 'protein', 'carbs', 'fats', 'rating')}
+    votes = array('q')
+    masks: List[int] = []
+    ids: List[str] = []
+    offsets = array('Q', [0])
+    with tempfile.TemporaryFile() as blob:
+        for r in recipes:
+            nut = r.nutrition
+            for name, value in (('calories', nut.calories), ('protein', nut.protein), ('carbs', nut.carbs),
+                                ('fats', nut.fats), ('rating', r.rating or 0)):
+                cols[name].append(float(value))
+            votes.append(int(r.votes or 0))
+            mask = 0
+            for t in r.tags:
+                mask |= 1 << tag_bits.setdefault(t.lower(), len(tag_bits))
+            masks.append(mask)
+            ids.append(r.id)
+            fields = (r.id, r.name_uk, json.dumps(r.tags, ensure_ascii=False),
+                      json.dumps(r.ingredients, ensure_ascii=False), ingredient_text(r.ingredients),
+                      json.dumps(r.steps_uk, ensure_ascii=False), r.image or '')
+            for value in fields:
+                blob.write(value.encode('utf-8'))
+                offsets.append(blob.tell())
+        n = len(ids)
+        if len(set(ids)) != n:
+            raise ValueError("duplicate recipe ids in catalog")
+        mask_words = max(1, (len(tag_bits) + 63) // 64)
+        mask_col = array('Q')
+        for mask in masks:
+            for w in range(mask_words):
+                mask_col.append(mask >> (64 * w) & 0xFFFFFFFFFFFFFFFF)
+        id_order = array('I', sorted(range(n), key=ids.__getitem__))
+        starts = {}
+        with open(path, 'wb') as f:
+            f.write(_BINARY_HEADER.pack(BINARY_MAGIC, BINARY_VERSION, n, mask_words, len(BINARY_FIELDS)))
+            f.write(_BINARY_SECTIONS.pack(*([0] * len(BINARY_SECTIONS))))
+            sections = [('tags', json.dumps(list(tag_bits), ensure_ascii=False).encode('utf-8'))]
+            sections += [(name, cols[name].tobytes()) for name in ('calories', 'protein', 'carbs', 'fats', 'rating')]
+            sections += [('votes', votes.tobytes()), ('masks', mask_col.tobytes()),
+                         ('id_order', id_order.tobytes()), ('offsets', offsets.tobytes())]
+            for name, data in sections:
+                _pad8(f)
+                starts[name] = f.tell()
+                f.write(data)
+            _pad8(f)
+            starts['blob'] = f.tell()
+            blob.seek(0)
+            while True:
+                chunk = blob.read(1 << 20)
+                if not chunk:
+                    break
+                f.write(chunk)
+            starts['end'] = f.tell()
+            f.seek(_BINARY_HEADER.size)
+            f.write(_BINARY_SECTIONS.pack(*(starts[name] for name in BINARY_SECTIONS)))
+    return n
+
+
+class BinaryCatalogReader(CatalogLoader):
+    """Read-only view over a packed catalog file; the locator is the row number."""
+
+    def __init__(self, path: str):
+        import mmap
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        buf = memoryview(self._mm)
+        magic, version, self.n, self.mask_words, self.nfields = _BINARY_HEADER.unpack_from(buf, 0)
+        if magic != BINARY_MAGIC or version != BINARY_VERSION or self.nfields != len(BINARY_FIELDS):
+            raise ValueError(f"not a recipe catalog (v{BINARY_VERSION}): {path}")
+        self.sections = dict(zip(BINARY_SECTIONS, _BINARY_SECTIONS.unpack_from(buf, _BINARY_HEADER.size)))
+        self.buf = buf
+        self.tags: List[str] = json.loads(bytes(self.section('tags')).rstrip(b'\0').decode('utf-8'))
+        self.offsets = self.section('offsets').cast('Q')
+        self.blob = self.section('blob')
+        self.cols = {name: self.column(name, 'd', self.n) for name in ('calories', 'protein', 'carbs', 'fats', 'rating')}
+        self.votes = self.column('votes', 'q', self.n)
+
+    def section(self, name: str) -> memoryview:
+        # sections are written in BINARY_SECTIONS order, so each ends where the next begins
+        i = BINARY_SECTIONS.index(name)
+        start = self.sections[name]
+        end = self.sections[BINARY_SECTIONS[i + 1]] if i + 1 < len(BINARY_SECTIONS) else start
+        return self.buf[start:end]
+
+    def column(self, name: str, fmt: str, count: int) -> memoryview:
+        start = self.sections[name]
+        return self.buf[start:start + count * struct.calcsize(fmt)].cast(fmt)
+
+    def field(self, row: int, field: int) -> str:
+        i = row * self.nfields + field
+        return bytes(self.blob[self.offsets[i]:self.offsets[i + 1]]).decode('utf-8')
+
+    def iter_summaries(self) -> Iterable[RecipeSummary]:
+        for row in range(self.n):
+            yield self._summary(row)
+
+    def _summary(self, row: int) -> RecipeSummary:
+        c = self.cols
+        return RecipeSummary(self.field(row, 0), json.loads(self.field(row, 2)), self.field(row, 4),
+                             Nutrition(c['calories'][row], c['protein'][row], c['carbs'][row], c['fats'][row]),
+                             c['rating'][row], self.votes[row], row)
+
+    def fetch(self, locator: int) -> Recipe:
+        row = locator
+        rid, name, tags, ingredients, _, steps, image = (self.field(row, k) for k in range(self.nfields))
+        s = self._summary(row)
+        return Recipe(rid, name, json.loads(tags), json.loads(ingredients), s.nutrition,
+                      json.loads(steps), image, rating=s.rating, votes=s.votes)
+
+
+class _StringColumn:
+    """Sequence view of one string field of a BinaryCatalogReader."""
+
+    def __init__(self, reader: BinaryCatalogReader, field: str):
+        self.reader = reader
+        self.field = BINARY_FIELDS.index(field)
+
+    def __len__(self) -> int:
+        return self.reader.n
+
+    def __getitem__(self, row: int) -> str:
+        if not 0 <= row < self.reader.n:
+            raise IndexError(row)
+        return self.reader.field(row, self.field)
+
+
+class _IdIndex:
+    """id -> row lookup by binary search over the file's sorted id order."""
+
+    def __init__(self, reader: BinaryCatalogReader):
+        self.reader = reader
+        self.order = reader.column('id_order', 'I', reader.n)
+        self.removed = set()
+
+    def _find(self, recipe_id: str) -> Optional[int]:
+        if recipe_id in self.removed:
+            return None
+        lo, hi = 0, len(self.order)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.reader.field(self.order[mid], 0) < recipe_id:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(self.order) and self.reader.field(self.order[lo], 0) == recipe_id:
+            return self.order[lo]
+        return None
+
+    def get(self, recipe_id: str, default=None):
+        row = self._find(recipe_id)
+        return default if row is None else row
+
+    def __contains__(self, recipe_id) -> bool:
+        return self._find(recipe_id) is not None
+
+    def __getitem__(self, recipe_id: str) -> int:
+        row = self._find(recipe_id)
+        if row is None:
+            raise KeyError(recipe_id)
+        return row
+
+    def pop(self, recipe_id: str, default=None):
+        row = self._find(recipe_id)
+        if row is None:
+            return default
+        self.removed.add(recipe_id)
+        return row
+
+    def __len__(self) -> int:
+        return self.reader.n - len(self.removed)
+
+
+class MmapCatalog(RecipeCatalog):
+    """RecipeCatalog over a read-only mmap of a packed catalog file, shared by workers through the page cache.
+
+    Ratings, votes and removals stay per process; adding a recipe copies the columns into arrays first.
+    """
+
+    def __init__(self, path: str):
+        reader = BinaryCatalogReader(path)
+        n = reader.n
+        self.reader = reader
+        self.loader = reader
+        self.rows = {}
+        self.fetched = OrderedDict()
+        self.fetch_cache_size = FETCH_CACHE_SIZE
+        self._fetch_lock = threading.Lock()
+        self.locators = range(n)
+        self.tag_bits = {tag: bit for bit, tag in enumerate(reader.tags)}
+        self.calories = reader.cols['calories']
+        self.protein = reader.cols['protein']
+        self.carbs = reader.cols['carbs']
+        self.fats = reader.cols['fats']
+        self.rating = array('d', reader.cols['rating'])
+        self.votes = array('l', reader.votes)
+        masks = reader.column('masks', 'Q', n * reader.mask_words)
+        if reader.mask_words == 1:
+            self.tag_masks = masks
+        else:
+            self.tag_masks = [sum(masks[row * reader.mask_words + w] << (64 * w) for w in range(reader.mask_words))
+                              for row in range(n)]
+        self.ids = _StringColumn(reader, 'id')
+        self.ingredient_text = _StringColumn(reader, 'ingredients_text')
+        self.index = _IdIndex(reader)
+        self.live = bytearray(b'\x01' * n)
+        self.frozen = True
+
+    def _thaw(self):
+        n = self.reader.n
+        self.calories = array('d', self.calories)
+        self.protein = array('d', self.protein)
+        self.carbs = array('d', self.carbs)
+        self.fats = array('d', self.fats)
+        self.tag_masks = array('Q', self.tag_masks) if len(self.tag_bits) <= 64 else list(self.tag_masks)
+        self.ids = [self.ids[row] for row in range(n)]
+        self.ingredient_text = [self.ingredient_text[row] for row in range(n)]
+        removed = self.index.removed
+        self.index = {rid: row for row, rid in enumerate(self.ids) if rid not in removed}
+        self.locators = array('q', range(n))
+        self.frozen = False
+
+    def add(self, recipe: Recipe) -> int:
+        if self.frozen:
+            self._thaw()
+        return super().add(recipe)
 
 
 # ----------------------------
@@ -734,6 +863,22 @@ MOOD_STYLES = {
     'relax': ['comfort', 'treat'],
 }
 
+# extra tag score for each of the mood's style tags a recipe carries
+MOOD_STYLE_BONUS = 2
+
+# share of daily energy from protein / carbs / fats per goal
+MACRO_SPLITS = {
+    'lose-weight': (0.30, 0.40, 0.30),
+    'cutting': (0.35, 0.35, 0.30),
+    'gain-weight': (0.25, 0.50, 0.25),
+    'build-muscle': (0.30, 0.45, 0.25),
+    'fast-muscle-gain': (0.30, 0.45, 0.25),
+    'less-sugar': (0.25, 0.40, 0.35),
+    'less-fat': (0.25, 0.55, 0.20),
+}
+DEFAULT_MACRO_SPLIT = (0.20, 0.50, 0.30)
+NUTRIENTS = ('calories', 'protein', 'carbs', 'fats')
+
 def estimate_bmr(profile: dict) -> float:
     age = profile.get('age', DEFAULT_PROFILE['age'])
     weight = profile.get('weight_kg', DEFAULT_PROFILE['weight_kg'])
@@ -754,90 +899,1455 @@ def daily_calorie_target(profile: dict, goal: str) -> int:
     target = int(base * goal_mod)
     return target
 
+# integer codes for the columnar (array) versions; -1 (or any unknown code) means "use the default"
+SEX_CODES = {'female': 0, 'male': 1}
+ACTIVITY_CODES = {name: i for i, name in enumerate(ACTIVITY_MULTIPLIERS)}
+GOAL_CODES = {name: i for i, name in enumerate(GOAL_MODIFIERS)}
+
+def sex_code(sex) -> int:
+    """SEX_CODES value for any sex string, decided the way estimate_bmr() does."""
+    return SEX_CODES['male'] if str(sex).lower().startswith('m') else SEX_CODES['female']
+
+def _code_table(values: dict, default: float, codes):
+    # the default sits at the end of the table; unknown codes are sent there
+    table = np.array(list(values.values()) + [default], dtype=np.float64)
+    codes = np.asarray(codes, dtype=np.int64)
+    return table[np.where((codes >= 0) & (codes < len(values)), codes, len(values))]
+
+def estimate_bmr_array(age, weight, height, sex):
+    """estimate_bmr() over arrays of ages, weights (kg), heights (cm) and SEX_CODES."""
+    age = np.asarray(age, dtype=np.float64)
+    weight = np.asarray(weight, dtype=np.float64)
+    height = np.asarray(height, dtype=np.float64)
+    # same operations in the same order as the scalar formula, so results are bit-identical
+    bmr = 10 * weight + 6.25 * height - 5 * age + np.where(np.asarray(sex) == SEX_CODES['male'], 5.0, -161.0)
+    return np.maximum(1200, bmr)
+
+def daily_calorie_target_array(age, weight, height, sex, activity, goal):
+    """daily_calorie_target() over columns: activity and goal are ACTIVITY_CODES / GOAL_CODES."""
+    base = estimate_bmr_array(age, weight, height, sex) * _code_table(ACTIVITY_MULTIPLIERS, 1.55, activity)
+    # astype() truncates toward zero like int()
+    return (base * _code_table(GOAL_MODIFIERS, 1.0, goal)).astype(np.int64)
+
+def daily_calorie_targets(profiles: List[dict], goals: List[str]) -> List[int]:
+    """daily_calorie_target() for many (profile, goal) pairs."""
+    if not NUMPY_AVAILABLE or not profiles:
+        return [daily_calorie_target(profile, goal) for profile, goal in zip(profiles, goals)]
+    d = DEFAULT_PROFILE
+    return daily_calorie_target_array(
+        [p.get('age', d['age']) for p in profiles],
+        [p.get('weight_kg', d['weight_kg']) for p in profiles],
+        [p.get('height_cm', d['height_cm']) for p in profiles],
+        [sex_code(p.get('sex', d['sex'])) for p in profiles],
+        [ACTIVITY_CODES.get(p.get('activity', 'moderate'), -1) for p in profiles],
+        [GOAL_CODES.get(g, -1) for g in goals],
+    ).tolist()
+
+def profile_from_payload(payload: dict) -> dict:
+    """Profile from form/JSON fields, with the usual defaults."""
+    for field in ('sex', 'activity'):
+        if not isinstance(payload.get(field, ''), str):
+            raise TypeError(f"{field} must be a string")
+    return {
+        'age': int(payload.get('age', 30)),
+        'sex': payload.get('sex', 'male'),
+        'weight_kg': float(payload.get('weight_kg', 75)),
+        'height_cm': float(payload.get('height_cm', 175)),
+        'activity': payload.get('activity', 'moderate'),
+    }
+
+def forbidden_from_payload(payload: dict) -> List[str]:
+    """Forbidden terms of a JSON payload, which must be a list of strings."""
+    forbidden = payload.get('forbidden') or []
+    if not isinstance(forbidden, list) or not all(isinstance(f, str) for f in forbidden):
+        raise TypeError("forbidden must be a list of strings")
+    return forbidden
+
+def split_forbidden(text: str) -> List[str]:
+    """Forbidden terms from free text separated by ',', ';' or '/'."""
+    parts = []
+    for part in text.split(','):
+        for sub in part.split(';'):
+            parts.extend(sub.split('/'))
+    return [p.strip().lower() for p in parts if p.strip()]
+
+def macro_targets(calories: float, goal: str) -> tuple:
+    """Daily (calories, protein g, carbs g, fats g) for a calorie target and goal."""
+    p, c, f = MACRO_SPLITS.get(goal, DEFAULT_MACRO_SPLIT)
+    return (float(calories), calories * p / 4, calories * c / 4, calories * f / 9)
+
 # ----------------------------
 # Menu planner with exclusion support
 # ----------------------------
+def new_seed() -> int:
+    """Fresh seed for a request; does not touch the module-level random state."""
+    return int.from_bytes(os.urandom(4), 'big')
+
+
+def parse_seed(value) -> Optional[int]:
+    """Seed from a form/JSON value; empty or missing means "no seed"."""
+    if value is None or value == '':
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def meal_to_dict(recipe: Recipe) -> dict:
+    return {'id': recipe.id, 'name_uk': recipe.name_uk, 'nutrition': recipe.nutrition.to_dict(), 'ingredients': recipe.ingredients,
+            'steps_uk': recipe.steps_uk, 'image': recipe.image, 'rating': recipe.rating, 'votes': recipe.votes}
+
+
+def day_totals(meals: Dict[str, Recipe]) -> Nutrition:
+    total = Nutrition(0, 0, 0, 0)
+    for r in meals.values():
+        total += r.nutrition
+    return total
+
+
+def _nutrition_score(goal: str, calories: float, protein: float) -> float:
+    if goal in ('lose-weight', 'cutting'):
+        return max(0, 50 - (calories / 10))
+    if goal in ('gain-weight', 'fast-muscle-gain', 'build-muscle'):
+        return (protein * 2) + (calories / 50)
+    return 20 - abs(calories - 500) / 20
+
+
+def _nutrition_scores(goal: str, calories, protein):
+    """Array version of _nutrition_score()."""
+    if goal in ('lose-weight', 'cutting'):
+        return np.maximum(0, 50 - (calories / 10))
+    if goal in ('gain-weight', 'fast-muscle-gain', 'build-muscle'):
+        return (protein * 2) + (calories / 50)
+    return 20 - np.abs(calories - 500) / 20
+
+
+_MASK64 = (1 << 64) - 1
+
+
+def _diversity(salt: int, row: int) -> float:
+    """Diversity noise in [0, 5) of `row` for the selection drawn as `salt`, whichever other rows are scored."""
+    z = (salt + (row + 1) * 0x9E3779B97F4A7C15) & _MASK64
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return ((z ^ (z >> 31)) >> 11) * (5.0 / (1 << 53))
+
+
+def _diversities(salt: int, rows):
+    """Array version of _diversity(); uint64 arithmetic wraps like the masks above."""
+    z = (rows.astype(np.uint64) + np.uint64(1)) * np.uint64(0x9E3779B97F4A7C15) + np.uint64(salt)
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return ((z ^ (z >> np.uint64(31))) >> np.uint64(11)).astype(np.float64) * (5.0 / (1 << 53))
+
+
+def _tag_weights(tag_bits: Dict[str, int], mood: str, goal: str) -> List[tuple]:
+    """(bit, weight) pairs reproducing Recipe.matches(mood, goal) over tag masks."""
+    m = mood.lower()
+    g = goal.lower()
+    weights = []
+    for tag, bit in tag_bits.items():
+        w = (3 if tag in m else 0) + (4 if tag in g else 0)
+        if w:
+            weights.append((1 << bit, w))
+    if 'lose' in g and 'light' in tag_bits:
+        weights.append((1 << tag_bits['light'], 2))
+    if ('gain' in g or 'muscle' in g) and 'hearty' in tag_bits:
+        weights.append((1 << tag_bits['hearty'], 2))
+    for style in MOOD_STYLES.get(m, ()):
+        if style in tag_bits:
+            weights.append((1 << tag_bits[style], MOOD_STYLE_BONUS))
+    return weights
+
+
+class TagScorer:
+    """Recipe.matches() expressed over tag bitmasks: a list of (bit, weight) pairs."""
+
+    def __init__(self, weights: List[tuple]):
+        self.weights = weights
+        self._memo: Dict[int, int] = {}
+
+    def __call__(self, mask: int) -> int:
+        s = self._memo.get(mask)
+        if s is None:
+            s = sum(w for b, w in self.weights if mask & b)
+            self._memo[mask] = s
+        return s
+
+    def batch(self, masks):
+        """Scores for a NumPy array of masks (uint64, or object for >64 tags)."""
+        if masks.dtype == object:
+            return np.fromiter((self(int(m)) for m in masks), dtype=np.float64, count=len(masks))
+        out = np.zeros(len(masks), dtype=np.float64)
+        for b, w in self.weights:
+            out += (masks & np.uint64(b)).astype(bool) * w
+        return out
+
+
+class PlanCache:
+    """In-process LRU cache, with a TTL, of the meals planned for seeded, normalized requests."""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 600.0, calorie_bucket: int = 50):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.calorie_bucket = max(1, int(calorie_bucket))
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def bucket(self, calories: float) -> int:
+        """Calorie target that every request in the same bucket is planned for."""
+        return int(round(calories / self.calorie_bucket)) * self.calorie_bucket
+
+    def key(self, mood: str, goal: str, activity: str, calories: float, forbidden: Optional[List[str]], seed,
+            mode: str = 'greedy', alternatives: int = 0) -> tuple:
+        """Cache key of a request; mood and goal arrive normalized from generate_plan()."""
+        return (mood, goal, str(activity).strip().lower(),
+                self.bucket(calories), forbidden_key(forbidden), seed, mode, alternatives)
+
+    def get(self, key: tuple):
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and item[0] > now:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return item[1]
+            if item is not None:
+                del self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: tuple, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {'size': len(self._data), 'maxsize': self.maxsize, 'ttl': self.ttl,
+                    'hits': self.hits, 'misses': self.misses,
+                    'hit_rate': (self.hits / total) if total else 0.0}
+
+
+# relative weight of missing the calorie target vs. each macro target
+DEVIATION_WEIGHTS = (2.0, 1.0, 1.0, 1.0)
+# cost of one point of preference score given up against the category's best candidate
+PREFERENCE_WEIGHT = 0.01
+
+
+def search_day(options: List[list], targets: tuple, deadline: float, incumbent: Optional[List[int]] = None,
+               max_nodes: Optional[int] = None) -> tuple:
+    """Branch-and-bound over one (row, macros, regret) option list per category, until `deadline` or `max_nodes`.
+
+    Returns (picks, cost, nodes, complete); picks are option indices, or None if every day repeats a row.
+    """
+    n = len(options)
+    dims = range(len(targets))
+    scale = [w / t if t > 0 else 0.0 for w, t in zip(DEVIATION_WEIGHTS, targets)]
+    lo = [[0.0] * len(targets) for _ in range(n + 1)]
+    hi = [[0.0] * len(targets) for _ in range(n + 1)]
+    for d in range(n - 1, -1, -1):
+        for j in dims:
+            values = [o[1][j] for o in options[d]]
+            lo[d][j] = lo[d + 1][j] + min(values)
+            hi[d][j] = hi[d + 1][j] + max(values)
+
+    def bound(totals, regret, depth):
+        lb = PREFERENCE_WEIGHT * regret
+        low, high = lo[depth], hi[depth]
+        for j in dims:
+            need = targets[j] - totals[j]
+            if need < low[j]:
+                lb += scale[j] * (low[j] - need)
+            elif need > high[j]:
+                lb += scale[j] * (need - high[j])
+        return lb
+
+    if incumbent is None:
+        incumbent = [0] * n
+    best_picks = None
+    best = float('inf')
+    rows = [options[d][i][0] for d, i in enumerate(incumbent)]
+    if len(set(rows)) == n:
+        totals = [sum(options[d][i][1][j] for d, i in enumerate(incumbent)) for j in dims]
+        best = bound(totals, sum(options[d][i][2] for d, i in enumerate(incumbent)), n)
+        best_picks = list(incumbent)
+
+    nodes = 0
+    limit = float('inf') if max_nodes is None else max_nodes
+    complete = True
+    picks = [0] * n
+    used = set()
+
+    def expand(depth, totals, regret):
+        nonlocal best, best_picks, nodes, complete
+        children = []
+        for i, (row, nut, reg) in enumerate(options[depth]):
+            if row in used:
+                continue
+            t = [totals[j] + nut[j] for j in dims]
+            lb = bound(t, regret + reg, depth + 1)
+            if lb < best:
+                children.append((lb, i, t, regret + reg, row))
+        children.sort(key=lambda c: c[0])
+        last = depth + 1 == n
+        for lb, i, t, r, row in children:
+            if lb >= best:
+                break
+            picks[depth] = i
+            if last:
+                # at a leaf the bound is the exact cost
+                best = lb
+                best_picks = list(picks)
+                break
+            if nodes >= limit or time.perf_counter() > deadline:
+                complete = False
+                return
+            nodes += 1
+            used.add(row)
+            expand(depth + 1, t, r)
+            used.discard(row)
+            if not complete:
+                return
+
+    if n:
+        expand(0, [0.0] * len(targets), 0.0)
+    return best_picks, best, nodes, complete
+
+
+def _position(rows: array, row: int) -> int:
+    """Index of `row` in an array('i'), or -1."""
+    if NUMPY_AVAILABLE:
+        hit = np.flatnonzero(np.frombuffer(rows, dtype=np.int32) == row)
+        return int(hit[0]) if len(hit) else -1
+    try:
+        return rows.index(row)
+    except ValueError:
+        return -1
+
+
+class ShortlistTable:
+    """Warm top-N candidate lists per (category, mood, goal, calorie band), each with a bound on the rows left out.
+
+    A list is used only when its bound proves it holds the top k; otherwise the caller scans the category.
+    """
+
+    # extra score range kept below the cut-off so filtered rows rarely force a fallback
+    SLACK = 1.0
+
+    def __init__(self, planner: 'MenuPlanner', size: int = 32, max_size: int = 2048, band_width: int = 100):
+        self.planner = planner
+        self.size = size
+        self.max_size = max(size, max_size)
+        self.band_width = band_width
+        # category -> (mood, goal, band) -> (neg_scores array('f'), rows array('i'), bound);
+        # single precision is plenty next to the margin and halves the footprint
+        self.lists: Dict[str, Dict[tuple, tuple]] = {}
+        self._lock = threading.Lock()
+
+    def band(self, target_cal: float) -> int:
+        return int(target_cal // self.band_width)
+
+    def _centre(self, band: int) -> float:
+        return (band + 0.5) * self.band_width
+
+    def margin(self) -> float:
+        # noise spread plus how far two rows' penalties can move inside one band
+        return 5 + 2 * (self.band_width / 2) / 50
+
+    def clear(self):
+        with self._lock:
+            self.lists = {}
+
+    def _build(self, cat: str, mood: str, goal: str, bands: Iterable[int]) -> Dict[int, tuple]:
+        """Lists for several bands of one (category, mood, goal); base scores are computed once."""
+        planner = self.planner
+        rows = planner.rows_with_tag(cat)
+        tag_score = planner.tag_scorer(mood, goal)
+        n = self.max_size + 1
+        built = {}
+        if planner.batch_scoring and len(rows) >= planner.BATCH_MIN_CANDIDATES:
+            idx = np.asarray(rows, dtype=np.intp)
+            base = planner.score_batch(idx, goal, tag_score, noise=False)
+            calories = planner._columns()['calories'][idx]
+            for band in bands:
+                neg = np.abs(calories - self._centre(band)) / 50 - base
+                top = np.argpartition(neg, n - 1)[:n] if len(neg) > n else np.arange(len(neg))
+                top = top[np.lexsort((idx[top], neg[top]))]
+                built[band] = self._cut(neg[top], idx[top])
+        else:
+            calories = planner.catalog.calories
+            base = [(planner.base_score_row(r, goal, tag_score), r) for r in rows]
+            for band in bands:
+                centre = self._centre(band)
+                ranked = heapq.nsmallest(n, ((abs(calories[r] - centre) / 50 - b, r) for b, r in base))
+                built[band] = self._cut([d for d, _ in ranked], [r for _, r in ranked])
+        return built
+
+    def _cut(self, neg, rows) -> tuple:
+        """Trim ascending negated scores (list or ndarray) to a list entry."""
+        n = len(neg)
+        keep = n
+        if keep > self.size:
+            # everything that could still reach the top k, with slack for filtering
+            k = max(1, self.planner.top_k)
+            threshold = float(neg[min(k, n) - 1]) + self.margin() + self.SLACK
+            keep = max(self.size, bisect.bisect_right(neg, threshold))
+        keep = min(keep, self.max_size)
+        bound = -float(neg[keep]) if n > keep else float('-inf')
+        if NUMPY_AVAILABLE and isinstance(neg, np.ndarray):
+            return (array('f', neg[:keep].astype(np.float32).tobytes()),
+                    array('i', rows[:keep].astype(np.int32).tobytes()), bound)
+        return array('f', neg[:keep]), array('i', rows[:keep]), bound
+
+    def entry(self, cat: str, mood: str, goal: str, band: int) -> tuple:
+        key = (mood, goal, band)
+        entry = self.lists.get(cat, {}).get(key)
+        if entry is None:
+            # built under the lock so a concurrent reposition cannot be lost
+            with self._lock:
+                lists = self.lists.setdefault(cat, {})
+                entry = lists.get(key)
+                if entry is None:
+                    entry = self._build(cat, mood, goal, (band,))[band]
+                    lists[key] = entry
+        return entry
+
+    def candidates(self, cat: str, mood: str, goal: str, target_cal: float, allowed, exclude=(),
+                   k: Optional[int] = None) -> Optional[List[int]]:
+        """Shortlisted rows that provably contain the top k (default top_k) for this request, or None."""
+        if (mood, goal) not in self.planner.affinity:
+            return None
+        neg, rows, bound = self.entry(cat, mood, goal, self.band(target_cal))
+        k = self.planner.top_k if k is None else k
+        survivors = []
+        kth = None
+        for d, r in zip(neg, rows):
+            if r in exclude or not allowed(r):
+                continue
+            survivors.append(r)
+            if len(survivors) == k:
+                kth = -d
+        if bound == float('-inf'):
+            # the list is the whole category
+            return survivors
+        if kth is None or bound >= kth - self.margin():
+            return None
+        return survivors
+
+    def warm(self, moods: Optional[Iterable[str]] = None, goals: Optional[Iterable[str]] = None,
+             calorie_range: tuple = (1000, 4500)) -> int:
+        """Build lists for every category, known mood/goal and band the daily range can hit."""
+        built = 0
+        for cat in CATEGORY_TAGS:
+            if not self.planner.tag_index.get(cat):
+                continue
+            share = MEAL_ALLOCATION.get(cat, 0.25)
+            bands = range(self.band(calorie_range[0] * share), self.band(calorie_range[1] * share) + 1)
+            for mood in (moods or MOOD_STYLES):
+                for goal in (goals or GOAL_MODIFIERS):
+                    with self._lock:
+                        lists = self.lists.setdefault(cat, {})
+                        for band, entry in self._build(cat, mood, goal, bands).items():
+                            lists[(mood, goal, band)] = entry
+                            built += 1
+        return built
+
+    def reposition(self, row: int):
+        """Move one row to its new place after its score inputs (rating) changed or it was added."""
+        planner = self.planner
+        calories = planner.catalog.calories[row]
+        with self._lock:
+            for cat in planner.catalog.tags_of(row):
+                lists = self.lists.get(cat)
+                if not lists:
+                    continue
+                base: Dict[tuple, float] = {}
+                for key, (neg, rows, bound) in list(lists.items()):
+                    mood, goal, band = key
+                    b = base.get((mood, goal))
+                    if b is None:
+                        b = base[(mood, goal)] = planner.base_score_row(row, goal, planner.tag_scorer(mood, goal))
+                    det = b - abs(calories - self._centre(band)) / 50
+                    i = _position(rows, row)
+                    # at or below the bound the row simply stays out of the list
+                    enters = bound == float('-inf') or det > bound
+                    if i < 0 and not enters:
+                        continue
+                    neg, rows = array('f', neg), array('i', rows)
+                    if i >= 0:
+                        del neg[i]
+                        del rows[i]
+                    if enters:
+                        i = bisect.bisect_left(neg, -det)
+                        neg.insert(i, -det)
+                        rows.insert(i, row)
+                        if len(rows) > self.max_size:
+                            bound = max(bound, -neg.pop())
+                            rows.pop()
+                    lists[key] = (neg, rows, bound)
+
+    def discard(self, row: int):
+        """Drop a removed row; the bounds stay valid."""
+        with self._lock:
+            for lists in self.lists.values():
+                for key, (neg, rows, bound) in list(lists.items()):
+                    i = _position(rows, row)
+                    if i >= 0:
+                        neg, rows = array('f', neg), array('i', rows)
+                        del neg[i]
+                        del rows[i]
+                        lists[key] = (neg, rows, bound)
+
+
+class CalorieIndex:
+    """Rows of one category sorted by calories, in blocks whose maxima let bound() cap every row's score."""
+
+    BLOCK = 128
+
+    def __init__(self, catalog: RecipeCatalog, rows: Iterable[int]):
+        calories = catalog.calories
+        order = sorted(rows, key=lambda r: (calories[r], r))
+        self.rows = array('i', order)
+        self.calories = array('d', (calories[r] for r in order))
+        self.protein_max: List[float] = []
+        # only ever raised (see raise_rating()), so it stays an upper bound
+        self.rating_max: List[float] = []
+        self.masks: List[int] = []
+        for a in range(0, len(order), self.BLOCK):
+            block = order[a:a + self.BLOCK]
+            self.protein_max.append(max(catalog.protein[r] for r in block))
+            self.rating_max.append(max(catalog.rating[r] for r in block))
+            mask = 0
+            for r in block:
+                mask |= catalog.tag_masks[r]
+            self.masks.append(mask)
+
+    def __len__(self):
+        return len(self.rows)
+
+    @property
+    def blocks(self) -> int:
+        return len(self.masks)
+
+    def block(self, b: int) -> array:
+        return self.rows[b * self.BLOCK:(b + 1) * self.BLOCK]
+
+    def find(self, calories: float) -> int:
+        """Block holding the rows nearest to `calories`."""
+        return min(bisect.bisect_left(self.calories, calories), len(self.rows) - 1) // self.BLOCK
+
+    def raise_rating(self, row: int, rating: float):
+        p = _position(self.rows, row)
+        if p >= 0:
+            b = p // self.BLOCK
+            self.rating_max[b] = max(self.rating_max[b], rating)
+
+    def bound(self, b: int, goal: str, tag_score: TagScorer, target_cal: float) -> float:
+        """Upper bound on score minus calorie penalty over the rows of block b."""
+        lo = self.calories[b * self.BLOCK]
+        hi = self.calories[min(len(self.rows), (b + 1) * self.BLOCK) - 1]
+        points = [lo, hi] + [c for c in (500.0, target_cal) if lo < c < hi]
+        fit = max(_nutrition_score(goal, c, self.protein_max[b]) - abs(c - target_cal) / 50 for c in points)
+        # tag weights are positive, so the union of the masks scores at least as high as any row
+        return tag_score(self.masks[b]) * 1.5 + fit + 5 + self.rating_max[b] * 1.2
+
+
+class _CategoryPool:
+    """Allowed rows of one category with their noise-free scores; queries add noise and a per-row `penalty`."""
+
+    def __init__(self, planner: 'MenuPlanner', rows, goal: str, tag_score: TagScorer):
+        self.rows = list(rows)
+        self.vectorized = planner.batch_scoring and len(self.rows) >= planner.BATCH_MIN_CANDIDATES
+        if self.vectorized:
+            cols = planner._columns()
+            self.idx = np.asarray(self.rows, dtype=np.intp)
+            self.nuts = [cols[c][self.idx] for c in NUTRIENTS]
+            self.base = planner.score_batch(self.idx, goal, tag_score, noise=False)
+            self._pos: Optional[Dict[int, int]] = None
+        else:
+            cat = planner.catalog
+            self.nuts = [[col[i] for i in self.rows] for col in (cat.calories, cat.protein, cat.carbs, cat.fats)]
+            self.base = [planner.base_score_row(i, goal, tag_score) for i in self.rows]
+
+    def __len__(self):
+        return len(self.rows)
+
+    def _keep(self, positions):
+        self.rows = [self.rows[p] for p in positions]
+        if self.vectorized:
+            positions = np.asarray(positions, dtype=np.intp)
+            self.idx = self.idx[positions]
+            self.nuts = [v[positions] for v in self.nuts]
+            self.base = self.base[positions]
+            self._pos = None
+        else:
+            self.nuts = [[v[p] for p in positions] for v in self.nuts]
+            self.base = [self.base[p] for p in positions]
+
+    def narrow(self, k: int, cal_range: tuple, share: Optional[float] = None, targets_range: Optional[tuple] = None):
+        """Drop rows that cannot be in top(k) for any calorie target in `cal_range`
+        (with `share` and `targets_range`: in fit(k) for any day targets in that range).
+        """
+        if len(self.rows) <= k:
+            return
+        lo, hi = cal_range
+
+        def bounds(base, nuts, maximum):
+            # (best, worst) goodness of a row; fit() is lower-is-better, so it is negated
+            cal = nuts[0]
+            near = maximum(0, maximum(lo - cal, cal - hi)) / 50
+            far = maximum(abs(cal - lo), abs(cal - hi)) / 50
+            if share is None:
+                return base + 5 - near, base - far
+            best = PREFERENCE_WEIGHT * (base - near + 5)
+            worst = PREFERENCE_WEIGHT * (base - far)
+            for w, t_lo, t_hi, values in zip(DEVIATION_WEIGHTS, targets_range[0], targets_range[1], nuts):
+                if t_lo > 0:
+                    w_lo, w_hi = share * t_lo, share * t_hi
+                    best = best - w / t_hi * maximum(0, maximum(w_lo - values, values - w_hi))
+                    worst = worst - w / t_lo * maximum(abs(values - w_lo), abs(values - w_hi))
+            return best, worst
+
+        n = len(self.rows)
+        if self.vectorized:
+            best, worst = bounds(self.base, self.nuts, np.maximum)
+            threshold = np.partition(worst, n - k)[n - k]
+            self._keep(np.flatnonzero(best >= threshold))
+        else:
+            pairs = [bounds(b, nut, max) for b, nut in zip(self.base, zip(*self.nuts))]
+            threshold = heapq.nlargest(k, (w for _, w in pairs))[-1]
+            self._keep([p for p, (b, _) in enumerate(pairs) if b >= threshold])
+
+    def _penalties(self, penalty: Dict[int, float]):
+        out = np.zeros(len(self.rows))
+        if penalty:
+            if self._pos is None:
+                self._pos = {r: p for p, r in enumerate(self.rows)}
+            for r, v in penalty.items():
+                p = self._pos.get(r)
+                if p is not None:
+                    out[p] = v
+        return out
+
+    def top(self, k: int, target_cal: float, rng: random.Random, penalty: Dict[int, float]) -> List[int]:
+        """The k best rows by score minus calorie penalty and `penalty`, best first."""
+        salt = rng.getrandbits(64)
+        if self.vectorized:
+            scores = self.base + _diversities(salt, self.idx)
+            scores -= np.abs(self.nuts[0] - target_cal) / 50 + self._penalties(penalty)
+            ok = np.flatnonzero(np.isfinite(scores))
+            if k < len(ok):
+                ok = ok[np.argpartition(-scores[ok], k - 1)[:k]]
+            return self.idx[ok[np.argsort(-scores[ok], kind='stable')]].tolist()
+        scored = []
+        for r, base, cal in zip(self.rows, self.base, self.nuts[0]):
+            s = base + _diversity(salt, r) - abs(cal - target_cal) / 50 - penalty.get(r, 0.0)
+            if s != float('-inf'):
+                scored.append((s, r))
+        return [r for _, r in heapq.nlargest(k, scored, key=lambda x: x[0])]
+
+    def fit(self, k: int, share: float, targets: tuple, target_cal: float, rng: random.Random,
+            penalty: Optional[Dict[int, float]] = None) -> List[tuple]:
+        """The k (row, macros, preference) tuples that best fit one meal's `share` of the day targets."""
+        penalty = penalty or {}
+        scale = [w / t if t > 0 else 0.0 for w, t in zip(DEVIATION_WEIGHTS, targets)]
+        wanted = [share * t for t in targets]
+        salt = rng.getrandbits(64)
+        if self.vectorized:
+            prefs = self.base - np.abs(self.nuts[0] - target_cal) / 50 - self._penalties(penalty)
+            fit = -PREFERENCE_WEIGHT * (prefs + _diversities(salt, self.idx))
+            for values, w, sc in zip(self.nuts, wanted, scale):
+                fit += sc * np.abs(values - w)
+            ok = np.flatnonzero(np.isfinite(fit))
+            if k < len(ok):
+                ok = ok[np.argpartition(fit[ok], k - 1)[:k]]
+            ok = ok[np.argsort(fit[ok], kind='stable')]
+            return [(int(self.idx[i]), tuple(float(v[i]) for v in self.nuts), float(prefs[i])) for i in ok]
+        scored = []
+        for p, r in enumerate(self.rows):
+            nut = tuple(v[p] for v in self.nuts)
+            pref = self.base[p] - abs(nut[0] - target_cal) / 50 - penalty.get(r, 0.0)
+            if pref == float('-inf'):
+                continue
+            fit = sum(sc * abs(v - w) for v, w, sc in zip(nut, wanted, scale))
+            scored.append((fit - PREFERENCE_WEIGHT * (pref + _diversity(salt, r)), r, nut, pref))
+        return [(r, nut, pref) for _, r, nut, pref in heapq.nsmallest(k, scored, key=lambda x: x[0])]
+
+
 class MenuPlanner:
-    def __init__(self, recipes: Optional[List[Recipe]] = None):
-        load_sample_recipes()
-        self.recipes = recipes if recipes is not None else RECIPES
+    # below this many candidates the per-row Python loop beats NumPy's call overhead
+    BATCH_MIN_CANDIDATES = 64
+    # optimizer: candidates searched per category, and search nodes per day when there
+    # is no time budget (a few tens of ms; a node limit keeps seeded plans reproducible)
+    OPTIMIZE_CANDIDATES = 12
+    OPTIMIZE_NODES = 2000
+    # multi-day plans: score points taken off per earlier use of a recipe, and how far
+    # a day's targets may move away from the daily ones to make up for earlier days
+    VARIETY_PENALTY = 3.0
+    CARRY_LIMIT = 0.15
+
+    def __init__(self, recipes: Optional[List[Recipe]] = None, catalog: Optional[RecipeCatalog] = None, top_k: int = 5,
+                 plan_cache: Optional[PlanCache] = None, shortlists: bool = False):
+        # each meal is drawn at random from the top_k best-scoring candidates
+        self.top_k = top_k
+        self.plan_cache = plan_cache
+        if catalog is None:
+            if recipes is None:
+                catalog = RecipeCatalog.open(SAMPLE_CATALOG_PATH)
+            else:
+                catalog = RecipeCatalog(recipes)
+        # plain recipe list only when the planner was given one
+        self.recipes = recipes
+        self.catalog = catalog
+        # normalized tag -> rows carrying it; dicts keep catalog order and give O(1) removal
+        self.tag_index: Dict[str, Dict[int, None]] = {}
+        for row in self.catalog.live_rows():
+            self._index_row(row)
+        # forbidden_key -> per-row verdicts (0 unknown, 1 allowed, 2 forbidden)
+        self._exclusions: OrderedDict = OrderedDict()
+        self._exclusions_lock = threading.Lock()
+        self.exclusion_cache_size = 128
+        self.batch_scoring = NUMPY_AVAILABLE
+        self._np_cols: Optional[dict] = None
+        # category -> CalorieIndex, built on first use and dropped on add/remove
+        self._calorie_index: Dict[str, CalorieIndex] = {}
+        self.affinity: Dict[tuple, TagScorer] = {}
+        self._affinity_tags = -1
+        self._build_affinity()
+        self.shortlists: Optional[ShortlistTable] = ShortlistTable(self) if shortlists else None
+
+    def _index_row(self, row: int):
+        for tag in self.catalog.tags_of(row):
+            self.tag_index.setdefault(tag, {})[row] = None
+
+    def _unindex_row(self, row: int):
+        for tag in self.catalog.tags_of(row):
+            rows = self.tag_index.get(tag)
+            if rows is not None:
+                rows.pop(row, None)
+                if not rows:
+                    del self.tag_index[tag]
+
+    def allowed_filter(self, forbidden: Optional[List[str]]):
+        """Return a row -> bool predicate for the forbidden list, sharing its verdicts with equal lists."""
+        key = forbidden_key(forbidden)
+        if not key:
+            return lambda row: True
+        with self._exclusions_lock:
+            verdicts = self._exclusions.get(key)
+            if verdicts is None:
+                verdicts = bytearray()
+                self._exclusions[key] = verdicts
+                while len(self._exclusions) > self.exclusion_cache_size:
+                    self._exclusions.popitem(last=False)
+            else:
+                self._exclusions.move_to_end(key)
+        matcher = _compile_forbidden(key)
+        texts = self.catalog.ingredient_text
+
+        def allowed(row: int) -> bool:
+            if row >= len(verdicts):
+                verdicts.extend(bytes(len(texts) - len(verdicts)))
+            v = verdicts[row]
+            if not v:
+                v = 2 if matcher.search(texts[row]) else 1
+                verdicts[row] = v
+            return v == 1
+        return allowed
+
+    def rows_with_tag(self, tag: str) -> List[int]:
+        return list(self.tag_index.get(tag.lower(), ()))
+
+    def add_recipe(self, recipe: Recipe) -> int:
+        row = self.catalog.add(recipe)
+        if self.recipes is not None:
+            self.recipes.append(recipe)
+        self._index_row(row)
+        self._np_cols = None
+        self._calorie_index = {}
+        if self.shortlists is not None:
+            if self._affinity_tags != len(self.catalog.tag_bits):
+                # new tags change the affinity table and with it every list
+                self.shortlists.clear()
+            else:
+                self.shortlists.reposition(row)
+        self.invalidate()
+        return row
 
-    def score_recipe(self, recipe: Recipe, mood: str, goal: str) -> float:
+    def remove_recipe(self, recipe_id: str) -> bool:
+        row = self.catalog.index.get(recipe_id)
+        if row is None:
+            return False
+        recipe = self.catalog.recipe(row)
+        self._unindex_row(row)
+        self._calorie_index = {}
+        self.catalog.remove(recipe_id)
+        if self.shortlists is not None:
+            self.shortlists.discard(row)
+        if self.recipes is not None and recipe in self.recipes:
+            self.recipes.remove(recipe)
+        self.invalidate()
+        return True
+
+    def invalidate(self):
+        """Drop derived per-request state after the recipes or their ratings change."""
+        if self.plan_cache is not None:
+            self.plan_cache.clear()
+
+    def score_recipe(self, recipe: Recipe, mood: str, goal: str, rng: Optional[random.Random] = None) -> float:
         tag_score = recipe.matches(mood, goal)
         nut = recipe.nutrition
-        if goal in ('lose-weight', 'cutting'):
-            nutrition_score = max(0, 50 - (nut.calories / 10))
-        elif goal in ('gain-weight', 'fast-muscle-gain', 'build-muscle'):
-            nutrition_score = (nut.protein * 2) + (nut.calories / 50)
-        else:
-            nutrition_score = 20 - abs(nut.calories - 500) / 20
+        nutrition_score = _nutrition_score(goal, nut.calories, nut.protein)
         rating_score = (recipe.rating or 0) * 1.2
-        diversity = random.uniform(0, 5)
+        diversity = (rng or random).uniform(0, 5)
         score = tag_score * 1.5 + nutrition_score + diversity + rating_score
         return score
 
-    def choose_meals(self, mood: str, goal: str, calories_target: int, forbidden: Optional[List[str]] = None) -> Dict[str, Recipe]:
+    def tag_scorer(self, mood: str, goal: str) -> TagScorer:
+        """Return mask -> Recipe.matches() score for this mood/goal, from the affinity table when it is known."""
+        if self._affinity_tags != len(self.catalog.tag_bits):
+            self._build_affinity()
+        scorer = self.affinity.get((mood, goal))
+        if scorer is None:
+            scorer = TagScorer(_tag_weights(self.catalog.tag_bits, mood, goal))
+        return scorer
+
+    def _build_affinity(self):
+        """Precompute Recipe.matches() per distinct tag mask for every MOOD_STYLES x GOAL_MODIFIERS pair."""
+        tag_bits = self.catalog.tag_bits
+        masks = set(self.catalog.tag_masks[row] for row in self.catalog.live_rows())
+        table: Dict[tuple, TagScorer] = {}
+        for mood in MOOD_STYLES:
+            for goal in GOAL_MODIFIERS:
+                scorer = TagScorer(_tag_weights(tag_bits, mood, goal))
+                for mask in masks:
+                    scorer(mask)
+                table[(mood, goal)] = scorer
+        self.affinity = table
+        self._affinity_tags = len(tag_bits)
+
+    def score_row(self, row: int, goal: str, tag_score, salt: Optional[int] = None) -> float:
+        """Columnar equivalent of score_recipe() for catalog row `row`, noise drawn as _diversity(salt, row)."""
+        cat = self.catalog
+        nutrition_score = _nutrition_score(goal, cat.calories[row], cat.protein[row])
+        diversity = _diversity(new_seed() if salt is None else salt, row)
+        return tag_score(cat.tag_masks[row]) * 1.5 + nutrition_score + diversity + cat.rating[row] * 1.2
+
+    def base_score_row(self, row: int, goal: str, tag_score) -> float:
+        """score_row() without the random diversity term."""
+        cat = self.catalog
+        return tag_score(cat.tag_masks[row]) * 1.5 + _nutrition_score(goal, cat.calories[row], cat.protein[row]) + cat.rating[row] * 1.2
+
+    def _columns(self) -> dict:
+        """NumPy views of the catalog columns, rebuilt after add/remove."""
+        if self._np_cols is None:
+            cat = self.catalog
+
+            def col(values, dtype):
+                if isinstance(values, memoryview):
+                    return np.frombuffer(values, dtype=dtype)
+                return np.array(values, dtype=dtype)
+            masks = cat.tag_masks
+            self._np_cols = {
+                'calories': col(cat.calories, np.float64),
+                'protein': col(cat.protein, np.float64),
+                'carbs': col(cat.carbs, np.float64),
+                'fats': col(cat.fats, np.float64),
+                'rating': col(cat.rating, np.float64),
+                'masks': col(masks, np.uint64) if len(cat.tag_bits) <= 64 else np.array(masks, dtype=object),
+            }
+        return self._np_cols
+
+    def score_batch(self, rows, goal: str, tag_score: TagScorer, target_cal: Optional[float] = None,
+                    salt: Optional[int] = None, noise: bool = True):
+        """Vectorized score_row() for many rows, minus the calorie penalty when target_cal is given."""
+        cols = self._columns()
+        idx = np.asarray(rows, dtype=np.intp)
+        calories = cols['calories'][idx]
+        scores = tag_score.batch(cols['masks'][idx]) * 1.5
+        scores += _nutrition_scores(goal, calories, cols['protein'][idx])
+        if noise:
+            scores += _diversities(new_seed() if salt is None else salt, idx)
+        scores += cols['rating'][idx] * 1.2
+        if target_cal is not None:
+            scores -= np.abs(calories - target_cal) / 50
+        return scores
+
+    def select_top(self, rows: List[int], goal: str, tag_score: TagScorer, target_cal: float,
+                   k: Optional[int] = None, exclude=(), rng: Optional[random.Random] = None) -> List[int]:
+        """The k best rows (score minus calorie penalty), best first, skipping `exclude`.
+
+        One salt from `rng` seeds the diversity noise of the whole selection.
+        """
+        rng = rng or random.Random()
+        k = self.top_k if k is None else k
+        if k <= 0:
+            return []
+        salt = rng.getrandbits(64)
+        if self.batch_scoring and len(rows) >= self.BATCH_MIN_CANDIDATES:
+            idx = np.asarray(rows, dtype=np.intp)
+            if exclude:
+                idx = idx[~np.isin(idx, np.fromiter(exclude, dtype=np.intp, count=len(exclude)))]
+            if not len(idx):
+                return []
+            scores = self.score_batch(idx, goal, tag_score, target_cal, salt=salt)
+            if k < len(idx):
+                kth = scores[np.argpartition(-scores, k - 1)[:k]].min()
+                # keep every row tied with the k-th score so ties resolve in catalog order
+                keep = np.flatnonzero(scores >= kth)
+            else:
+                keep = np.arange(len(idx))
+            order = keep[np.argsort(-scores[keep], kind='stable')][:k]
+            return idx[order].tolist()
+        calories = self.catalog.calories
+        scored = ((self.score_row(i, goal, tag_score, salt) - abs(calories[i] - target_cal) / 50, i)
+                  for i in rows if i not in exclude)
+        return [i for _, i in heapq.nlargest(k, scored, key=lambda x: x[0])]
+
+    def rate_recipe(self, recipe_id: str, value: float) -> Optional[Recipe]:
+        row = self.catalog.index.get(recipe_id)
+        if row is None:
+            return None
+        recipe = self.catalog.recipe(row)
+        recipe.add_rating(value)
+        self.catalog.set_rating(row, recipe.rating, recipe.votes)
+        if self._np_cols is not None:
+            self._np_cols['rating'][row] = self.catalog.rating[row]
+        for tag in self.catalog.tags_of(row):
+            index = self._calorie_index.get(tag)
+            if index is not None:
+                index.raise_rating(row, self.catalog.rating[row])
+        if self.shortlists is not None:
+            self.shortlists.reposition(row)
+        self.invalidate()
+        return recipe
+
+    def calorie_index(self, cat: str) -> Optional[CalorieIndex]:
+        """CalorieIndex of the rows tagged `cat`, or None if there are none."""
+        cat = cat.lower()
+        index = self._calorie_index.get(cat)
+        if index is None:
+            rows = self.tag_index.get(cat)
+            if not rows:
+                return None
+            index = CalorieIndex(self.catalog, rows)
+            self._calorie_index[cat] = index
+        return index
+
+    def window_top(self, cat: str, goal: str, tag_score: TagScorer, target_cal: float, allowed,
+                   rng: random.Random, exclude=(), k: Optional[int] = None) -> Optional[List[int]]:
+        """select_top() over the allowed rows of `cat`, scoring CalorieIndex blocks only while they can reach the top k.
+
+        None when no row of the category survives.
+        """
+        k = self.top_k if k is None else k
+        index = self.calorie_index(cat)
+        if index is None or k <= 0:
+            return None
+        calories = self.catalog.calories
+        salt = rng.getrandbits(64)
+        start = index.find(target_cal)
+        order = sorted(((b != start, -index.bound(b, goal, tag_score, target_cal), b) for b in range(index.blocks)))
+        best: List[tuple] = []
+        pos, step = 0, 1
+        while pos < len(order) and not (len(best) == k and best[-1][0] > -order[pos][1]):
+            # the window grows geometrically, so few rounds are needed however many rows are filtered out
+            batch = order[pos:pos + step]
+            pos += step
+            step *= 2
+            if len(best) == k:
+                batch = [o for o in batch if -o[1] >= best[-1][0]]
+            fresh = [r for _, _, b in batch for r in index.block(b) if r not in exclude and allowed(r)]
+            if self.batch_scoring and len(fresh) >= self.BATCH_MIN_CANDIDATES:
+                scores = self.score_batch(fresh, goal, tag_score, target_cal, salt=salt).tolist()
+            else:
+                scores = [self.score_row(r, goal, tag_score, salt) - abs(calories[r] - target_cal) / 50 for r in fresh]
+            best = heapq.nlargest(k, itertools.chain(best, zip(scores, fresh)), key=lambda x: x[0])
+        if not best:
+            return None
+        return [r for _, r in best]
+
+    def category_candidates(self, cat: str, allowed) -> List[int]:
+        """Allowed rows tagged `cat`; any allowed row if the category has none."""
+        cat_data = self.catalog
+        candidates = self.rows_with_tag(cat)
+        if not candidates:
+            candidates = cat_data.live_rows()
+        candidates = [i for i in candidates if allowed(i)]
+        if not candidates:
+            candidates = [i for i in cat_data.live_rows() if allowed(i)]
+        return candidates
+
+    def category_pool(self, cat: str, goal: str, tag_score: TagScorer, allowed,
+                      pools: Optional[Dict[str, _CategoryPool]] = None) -> _CategoryPool:
+        """Scored allowed rows of `cat`, taken from or added to `pools`."""
+        pool = pools.get(cat) if pools is not None else None
+        if pool is None:
+            pool = _CategoryPool(self, self.category_candidates(cat, allowed), goal, tag_score)
+            if pools is not None:
+                pools[cat] = pool
+        return pool
+
+    def choose_meals(self, mood: str, goal: str, calories_target: int, forbidden: Optional[List[str]] = None,
+                     rng: Optional[random.Random] = None, pools: Optional[Dict[str, _CategoryPool]] = None) -> Dict[str, Recipe]:
+        """Greedy day: each meal drawn at random from the top_k rows of its category."""
+        # a private generator per request: no shared state between threads
+        rng = rng or random.Random()
         categories = ['breakfast', 'lunch', 'snack', 'dinner']
         chosen: Dict[str, Recipe] = {}
-        used_ids = set()
-        allocation = {'breakfast': 0.25, 'lunch': 0.35, 'snack': 0.1, 'dinner': 0.3}
+        used_rows = set()
+        allocation = MEAL_ALLOCATION
         forbidden = [f.strip().lower() for f in (forbidden or []) if f.strip()]
+        cat_data = self.catalog
+        tag_score = self.tag_scorer(mood, goal)
+        allowed = self.allowed_filter(forbidden)
         for cat in categories:
             target_cal = calories_target * allocation.get(cat, 0.25)
-            candidates = [r for r in self.recipes if cat in [t.lower() for t in r.tags]]
-            if not candidates:
-                candidates = self.recipes[:]
-            candidates = [r for r in candidates if not r.contains_forbidden(forbidden)]
-            if not candidates:
-                candidates = [r for r in self.recipes if not r.contains_forbidden(forbidden)]
-            scored = []
-            for r in candidates:
-                if r.id in used_ids:
-                    continue
-                s = self.score_recipe(r, mood, goal) - abs(r.nutrition.calories - target_cal) / 50
-                scored.append((s, r))
-            scored.sort(key=lambda x: x[0], reverse=True)
-            if scored:
-                top_n = scored[:5]
-                selected = random.choice(top_n)[1]
-                chosen[cat] = selected
-                used_ids.add(selected.id)
+            top_n = None
+            if self.shortlists is not None:
+                survivors = self.shortlists.candidates(cat, mood, goal, target_cal, allowed, used_rows)
+                if survivors:
+                    top_n = self.select_top(survivors, goal, tag_score, target_cal, rng=rng)
+            if top_n is None:
+                top_n = self.window_top(cat, goal, tag_score, target_cal, allowed, rng, used_rows)
+            if top_n is None:
+                pool = self.category_pool(cat, goal, tag_score, allowed, pools)
+                top_n = pool.top(self.top_k, target_cal, rng, dict.fromkeys(used_rows, float('inf')))
+            if top_n:
+                selected = rng.choice(top_n)
+                chosen[cat] = cat_data.recipe(selected)
+                used_rows.add(selected)
             else:
-                available_recipes = [r for r in self.recipes if r.id not in used_ids]
-                if available_recipes:
-                    chosen[cat] = random.choice(available_recipes)
+                available = [i for i in cat_data.live_rows() if i not in used_rows]
+                if available:
+                    chosen[cat] = cat_data.recipe(rng.choice(available))
         return chosen
 
-    def generate_plan(self, mood: str, goal: str, profile: dict, forbidden: Optional[List[str]] = None) -> dict:
+    def optimize_meals(self, mood: str, goal: str, calories_target: int, forbidden: Optional[List[str]] = None,
+                       rng: Optional[random.Random] = None, time_budget: Optional[float] = None,
+                       floor: Optional[Dict[str, Recipe]] = None,
+                       pools: Optional[Dict[str, _CategoryPool]] = None, max_nodes: Optional[int] = None) -> tuple:
+        """Pick the day's meals jointly with search_day(), starting from `floor` when given.
+
+        Returns (meals, info); info['optimal'] is False when the node limit or `time_budget` cut the search short.
+        """
+        started = time.perf_counter()
+        if time_budget is None:
+            deadline = float('inf')
+            if max_nodes is None:
+                max_nodes = self.OPTIMIZE_NODES
+        else:
+            deadline = started + time_budget
+        rng = rng or random.Random()
+        forbidden = [f.strip().lower() for f in (forbidden or []) if f.strip()]
+        cat_data = self.catalog
+        tag_score = self.tag_scorer(mood, goal)
+        allowed = self.allowed_filter(forbidden)
+        targets = macro_targets(calories_target, goal)
+        floor_rows = {cat: cat_data.index[r.id] for cat, r in (floor or {}).items() if r.id in cat_data.index}
+        info = {
+            'optimal': False,
+            'cost': None,
+            'nodes': 0,
+            'elapsed_ms': 0.0,
+            'targets': dict(zip(NUTRIENTS, (round(t, 1) for t in targets))),
+        }
+        categories = []
+        options = []
+        incumbent = []
+        for cat in CATEGORY_TAGS:
+            if floor is not None and time.perf_counter() > deadline:
+                info['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 2)
+                return dict(floor), info
+            share = MEAL_ALLOCATION[cat]
+            target_cal = calories_target * share
+            # shortlists rank by score, not fit, so they could miss a candidate: always fit the full pool
+            pool = self.category_pool(cat, goal, tag_score, allowed, pools)
+            opts = pool.fit(self.OPTIMIZE_CANDIDATES, share, targets, target_cal, rng)
+            at = 0
+            if cat in floor_rows:
+                row = floor_rows[cat]
+                at = next((n for n, o in enumerate(opts) if o[0] == row), len(opts))
+                if at == len(opts):
+                    pref = self.base_score_row(row, goal, tag_score) - abs(cat_data.calories[row] - target_cal) / 50
+                    opts.append((row, (cat_data.calories[row], cat_data.protein[row], cat_data.carbs[row], cat_data.fats[row]), pref))
+            if not opts:
+                continue
+            best = max(pref for _, _, pref in opts)
+            options.append([(i, nut, best - pref) for i, nut, pref in opts])
+            categories.append(cat)
+            incumbent.append(at)
+        picks, cost, nodes, complete = search_day(options, targets, deadline, incumbent, max_nodes)
+        chosen: Dict[str, Recipe] = {}
+        if picks is not None:
+            for cat, opts, i in zip(categories, options, picks):
+                chosen[cat] = cat_data.recipe(opts[i][0])
+        elif floor is not None:
+            chosen = dict(floor)
+        info.update({
+            'optimal': complete,
+            'cost': round(cost, 4) if picks is not None else None,
+            'nodes': nodes,
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 2),
+        })
+        return chosen, info
+
+    def swap_meal(self, plan: dict, category: str, forbidden: Optional[List[str]] = None,
+                  rng: Optional[random.Random] = None, shopping: Optional[Dict[str, float]] = None) -> Optional[dict]:
+        """Replace plan['meals'][category] in place with another recipe of that category, updating totals and `shopping`.
+
+        Returns the new meal, or None when there is nothing to swap in.
+        """
+        rng = rng or random.Random()
+        if forbidden is None:
+            forbidden = plan.get('forbidden')
+        forbidden = [f.strip().lower() for f in (forbidden or []) if f.strip()]
+        cat_data = self.catalog
+        mood, goal = plan['mood'], plan['goal']
+        meals = plan['meals']
+        total = plan['total_nutrition']
+        old = meals.get(category)
+        exclude = {cat_data.index[m['id']] for m in meals.values() if m['id'] in cat_data.index}
+        target_cal = max(0, plan['calorie_target'] - total['calories'] + (old['nutrition']['calories'] if old else 0))
+        tag_score = self.tag_scorer(mood, goal)
+        allowed = self.allowed_filter(forbidden)
+        top_n = None
+        if self.shortlists is not None:
+            survivors = self.shortlists.candidates(category, mood, goal, target_cal, allowed, exclude)
+            if survivors:
+                top_n = self.select_top(survivors, goal, tag_score, target_cal, rng=rng)
+        if top_n is None:
+            top_n = self.window_top(category, goal, tag_score, target_cal, allowed, rng, exclude)
+        if top_n is None:
+            top_n = self.select_top(self.category_candidates(category, allowed), goal, tag_score, target_cal,
+                                    exclude=exclude, rng=rng)
+        if not top_n:
+            return None
+        new = meal_to_dict(cat_data.recipe(rng.choice(top_n)))
+        meals[category] = new
+        for name in NUTRIENTS:
+            total[name] = total[name] + new['nutrition'][name] - (old['nutrition'][name] if old else 0)
+        if shopping is not None:
+            update_shopping_list(shopping, old, new)
+        return new
+
+    def alternative_meals(self, mood: str, goal: str, calories_target: int, forbidden: Optional[List[str]] = None,
+                          count: int = 3, exclude_days: Iterable[Dict[str, Recipe]] = (), max_overlap: int = 1,
+                          rng: Optional[random.Random] = None,
+                          pools: Optional[Dict[str, _CategoryPool]] = None) -> List[Dict[str, Recipe]]:
+        """`count` more days sharing at most `max_overlap` recipes with `exclude_days` and with each other."""
+        rng = rng or random.Random()
+        forbidden = [f.strip().lower() for f in (forbidden or []) if f.strip()]
+        cat_data = self.catalog
+        tag_score = self.tag_scorer(mood, goal)
+        allowed = self.allowed_filter(forbidden)
+        previous = [{cat_data.index[r.id] for r in day.values() if r.id in cat_data.index} for day in exclude_days]
+        depth = self.top_k * (count + 1)
+        ranked = {}
+        for cat in CATEGORY_TAGS:
+            target_cal = calories_target * MEAL_ALLOCATION[cat]
+            survivors = None
+            if self.shortlists is not None:
+                survivors = self.shortlists.candidates(cat, mood, goal, target_cal, allowed, k=depth)
+            if survivors:
+                pool = _CategoryPool(self, survivors, goal, tag_score)
+            else:
+                pool = self.category_pool(cat, goal, tag_score, allowed, pools)
+            ranked[cat] = pool.top(depth, target_cal, rng, {})
+        days = []
+        for _ in range(count):
+            rows: Dict[str, int] = {}
+            overlap = [0] * len(previous)
+            for cat in CATEGORY_TAGS:
+                free = [r for r in ranked[cat] if r not in rows.values()]
+                eligible = [r for r in free if all(n < max_overlap for n, day in zip(overlap, previous) if r in day)]
+                top_n = (eligible or free)[:self.top_k]
+                if not top_n:
+                    continue
+                row = rng.choice(top_n)
+                rows[cat] = row
+                for n, day in enumerate(previous):
+                    if row in day:
+                        overlap[n] += 1
+            previous.append(set(rows.values()))
+            days.append({cat: cat_data.recipe(row) for cat, row in rows.items()})
+        return days
+
+    def generate_plans(self, requests: Iterable[dict], groups: Optional[Dict[tuple, dict]] = None) -> Iterable[dict]:
+        """plan_for_payload() for each request, plus its optional 'id', yielded in request order.
+
+        A request that cannot be planned yields {'id': ..., 'error': ...}.
+        """
+        requests = list(requests)
+        parsed = []
+        for req in requests:
+            try:
+                parsed.append((profile_from_payload(req), str(req.get('goal', 'maintain-weight')).strip().lower()))
+            except (AttributeError, TypeError, ValueError) as e:
+                parsed.append(e)
+        good = [i for i, p in enumerate(parsed) if isinstance(p, tuple)]
+        targets = dict(zip(good, daily_calorie_targets([parsed[i][0] for i in good], [parsed[i][1] for i in good])))
+        if groups is None:
+            groups = {}
+        for i, req in enumerate(requests):
+            error = parsed[i] if i not in targets else None
+            if error is None:
+                try:
+                    mood = str(req.get('mood', 'happy')).strip().lower()
+                    pools = groups.setdefault((mood, parsed[i][1], forbidden_key(forbidden_from_payload(req))), {})
+                    plan = plan_for_payload(self, req, calorie_target=targets[i], pools=pools)
+                except (AttributeError, KeyError, TypeError, ValueError) as e:
+                    error = e
+            if error is not None:
+                yield {'id': req.get('id') if isinstance(req, dict) else None, 'error': str(error)}
+                continue
+            if 'id' in req:
+                plan['id'] = req['id']
+            yield plan
+
+    def generate_week(self, mood: str, goal: str, profile: dict, forbidden: Optional[List[str]] = None,
+                      days: int = 7, seed: Optional[int] = None, mode: str = 'greedy',
+                      no_repeat_days: Optional[int] = None, time_budget: Optional[float] = None) -> dict:
+        """Plan `days` consecutive days, not repeating a recipe within `no_repeat_days`.
+
+        What one day over- or undershoots is carried into the next, within CARRY_LIMIT.
+        """
+        days = max(1, int(days))
+        if seed is None:
+            seed = new_seed()
+        rng = random.Random(seed)
         target = daily_calorie_target(profile, goal)
-        meals = self.choose_meals(mood, goal, target, forbidden)
-        total_nut = Nutrition(0, 0, 0, 0)
-        for r in meals.values():
-            total_nut += r.nutrition
+        daily = macro_targets(target, goal)
+        forbidden = [f.strip().lower() for f in (forbidden or []) if f.strip()]
+        cat_data = self.catalog
+        tag_score = self.tag_scorer(mood, goal)
+        allowed = self.allowed_filter(forbidden)
+        low = tuple(d * (1 - self.CARRY_LIMIT) for d in daily)
+        high = tuple(d * (1 + self.CARRY_LIMIT) for d in daily)
+        pools = {}
+        for cat in CATEGORY_TAGS:
+            pool = _CategoryPool(self, self.category_candidates(cat, allowed), goal, tag_score)
+            share = MEAL_ALLOCATION[cat]
+            # every used row may be penalized on a later day
+            if mode == 'optimize':
+                pool.narrow(self.OPTIMIZE_CANDIDATES + days * len(CATEGORY_TAGS), (low[0] * share, high[0] * share),
+                            share, (low, high))
+            else:
+                pool.narrow(self.top_k + days * len(CATEGORY_TAGS), (low[0] * share, high[0] * share))
+            if len(pool):
+                pools[cat] = pool
+        started = time.perf_counter()
+        optimal = True
+        last_used: Dict[int, int] = {}
+        uses: Dict[int, int] = {}
+        consumed = [0.0] * len(daily)
+        week_total = Nutrition(0, 0, 0, 0)
+        start_date = datetime.date.today()
+        day_plans = []
+        for day in range(days):
+            left = days - day
+            day_targets = tuple(min(max((d * days - c) / left, lo), hi) for d, c, lo, hi in zip(daily, consumed, low, high))
+            penalties = {}
+            for cat, pool in pools.items():
+                window = min(days if no_repeat_days is None else no_repeat_days, len(pool) - 1)
+                penalties[cat] = {r: float('inf') if day - d <= window else self.VARIETY_PENALTY * uses[r]
+                                  for r, d in last_used.items()}
+            chosen_rows: Dict[str, int] = {}
+            if mode == 'optimize':
+                categories = []
+                options = []
+                for cat, pool in pools.items():
+                    share = MEAL_ALLOCATION[cat]
+                    opts = pool.fit(self.OPTIMIZE_CANDIDATES, share, day_targets, day_targets[0] * share, rng, penalties[cat])
+                    if not opts:
+                        opts = pool.fit(self.OPTIMIZE_CANDIDATES, share, day_targets, day_targets[0] * share, rng)
+                    best = max(pref for _, _, pref in opts)
+                    options.append([(i, nut, best - pref) for i, nut, pref in opts])
+                    categories.append(cat)
+                if time_budget is None:
+                    picks, _, _, complete = search_day(options, day_targets, float('inf'), max_nodes=self.OPTIMIZE_NODES)
+                else:
+                    now = time.perf_counter()
+                    picks, _, _, complete = search_day(options, day_targets,
+                                                       now + max(0.0, started + time_budget - now) / left)
+                optimal = optimal and complete
+                if picks is not None:
+                    for cat, opts, i in zip(categories, options, picks):
+                        chosen_rows[cat] = opts[i][0]
+            else:
+                for cat, pool in pools.items():
+                    target_cal = day_targets[0] * MEAL_ALLOCATION[cat]
+                    today = {r: float('inf') for r in chosen_rows.values()}
+                    top_n = pool.top(self.top_k, target_cal, rng, {**penalties[cat], **today})
+                    if not top_n:
+                        top_n = pool.top(self.top_k, target_cal, rng, today)
+                    if top_n:
+                        chosen_rows[cat] = rng.choice(top_n)
+            meals = {}
+            total_nut = Nutrition(0, 0, 0, 0)
+            for cat, row in chosen_rows.items():
+                recipe = cat_data.recipe(row)
+                meals[cat] = meal_to_dict(recipe)
+                total_nut += recipe.nutrition
+                last_used[row] = day
+                uses[row] = uses.get(row, 0) + 1
+            for j, name in enumerate(NUTRIENTS):
+                consumed[j] += getattr(total_nut, name)
+            week_total += total_nut
+            day_plans.append({
+                'date': (start_date + datetime.timedelta(days=day)).isoformat(),
+                'profile': profile,
+                'goal': goal,
+                'mood': mood,
+                'seed': seed,
+                'calorie_target': int(round(day_targets[0])),
+                'meals': meals,
+                'total_nutrition': total_nut.to_dict(),
+            })
+        week = {
+            'start_date': start_date.isoformat(),
+            'profile': profile,
+            'goal': goal,
+            'mood': mood,
+            'seed': seed,
+            'calorie_target': target,
+            'targets': dict(zip(NUTRIENTS, (round(d * days, 1) for d in daily))),
+            'days': day_plans,
+            'total_nutrition': week_total.to_dict(),
+        }
+        if mode == 'optimize':
+            week['optimizer'] = {'optimal': optimal, 'elapsed_ms': round((time.perf_counter() - started) * 1000, 2)}
+        return week
+
+    def generate_plan(self, mood: str, goal: str, profile: dict, forbidden: Optional[List[str]] = None,
+                      seed: Optional[int] = None, use_cache: bool = True, mode: str = 'greedy',
+                      time_budget: Optional[float] = None, alternatives: int = 0,
+                      calorie_target: Optional[int] = None, pools: Optional[Dict[str, _CategoryPool]] = None) -> dict:
+        """Build a one-day plan; the same seed (and catalog) always gives the same plan.
+
+        `mode`, `time_budget` and `alternatives` are as in /api/plan; only seeded requests use the plan_cache.
+        """
+        started = time.perf_counter()
+        if time_budget is not None:
+            mode = 'anytime'
+        mood = str(mood).strip().lower()
+        goal = str(goal).strip().lower()
+        target = daily_calorie_target(profile, goal) if calorie_target is None else calorie_target
+        # an unseeded request asks for a new plan, so it neither reads nor fills the cache
+        cache = self.plan_cache if use_cache and seed is not None else None
+        cached = None
+        if cache is not None:
+            key = cache.key(mood, goal, profile.get('activity', 'moderate'), target, forbidden, seed, mode, alternatives)
+            cached = cache.get(key)
+        if cached is not None:
+            meal_dicts, total, extra = cached
+        else:
+            if seed is None:
+                seed = new_seed()
+            planning_target = cache.bucket(target) if cache is not None else target
+            extra = {}
+            rng = random.Random(seed)
+            if pools is None:
+                pools = {}
+            if mode == 'anytime':
+                floor = self.choose_meals(mood, goal, planning_target, forbidden, rng=rng, pools=pools)
+                remaining = max(0.0, time_budget - (time.perf_counter() - started))
+                meals, extra['optimizer'] = self.optimize_meals(mood, goal, planning_target, forbidden, rng=rng,
+                                                                time_budget=remaining, floor=floor, pools=pools)
+            elif mode == 'optimize':
+                meals, extra['optimizer'] = self.optimize_meals(mood, goal, planning_target, forbidden, rng=rng,
+                                                                pools=pools)
+            else:
+                meals = self.choose_meals(mood, goal, planning_target, forbidden, rng=rng, pools=pools)
+            meal_dicts = {k: meal_to_dict(v) for k, v in meals.items()}
+            total = day_totals(meals).to_dict()
+            if alternatives > 0:
+                days = self.alternative_meals(mood, goal, planning_target, forbidden, count=alternatives,
+                                              exclude_days=[meals], rng=rng, pools=pools)
+                extra['alternatives'] = [{'meals': {k: meal_to_dict(v) for k, v in day.items()},
+                                          'total_nutrition': day_totals(day).to_dict()} for day in days]
+            # a day cut short by the deadline is not worth reusing; a node limit cuts it the same way every time
+            if cache is not None and (mode != 'anytime' or extra['optimizer']['optimal']):
+                cache.put(key, (meal_dicts, total, extra))
         plan = {
             'date': datetime.date.today().isoformat(),
             'profile': profile,
             'goal': goal,
             'mood': mood,
+            'forbidden': [f.strip().lower() for f in (forbidden or []) if f.strip()],
+            'seed': seed,
             'calorie_target': target,
-            'meals': {k: {'id': v.id, 'name_uk': v.name_uk, 'nutrition': v.nutrition.to_dict(), 'ingredients': v.ingredients, 'steps_uk': v.steps_uk, 'image': v.image, 'rating': v.rating, 'votes': v.votes} for k, v in meals.items()},
-            'total_nutrition': total_nut.to_dict(),
+            'meals': {k: dict(v) for k, v in meal_dicts.items()},
+            'total_nutrition': dict(total),
         }
+        for k, v in extra.items():
+            plan[k] = [dict(day) for day in v] if isinstance(v, list) else dict(v)
+        if 'optimizer' in plan:
+            optimal = plan['optimizer']['optimal']
+            plan['meta'] = {
+                'mode': mode,
+                'optimal': optimal,
+                'truncated': not optimal,
+                'cached': cached is not None,
+                'elapsed_ms': round((time.perf_counter() - started) * 1000, 2),
+                'budget_ms': None if time_budget is None else round(time_budget * 1000, 2),
+            }
         return plan
 
 # ----------------------------
 # Shopping & explanation utilities
 # ----------------------------
+def _quantity(qty) -> float:
+    try:
+        return float(qty)
+    except Exception:
+        return 1
+
+
 def build_shopping_list(plan: dict) -> Dict[str, float]:
     items: Dict[str, float] = {}
     for meal in plan['meals'].values():
         for ingr, qty in meal['ingredients'].items():
-            try:
-                items[ingr] = items.get(ingr, 0) + float(qty)
-            except Exception:
-                items[ingr] = items.get(ingr, 0) + 1
+            items[ingr] = items.get(ingr, 0) + _quantity(qty)
+    return items
+
+
+def update_shopping_list(items: Dict[str, float], removed: Optional[dict] = None, added: Optional[dict] = None) -> Dict[str, float]:
+    """Apply a meal swap to a build_shopping_list() result in place."""
+    if removed:
+        for ingr, qty in removed['ingredients'].items():
+            left = items.get(ingr, 0) - _quantity(qty)
+            if left > 1e-9:
+                items[ingr] = left
+            else:
+                items.pop(ingr, None)
+    if added:
+        for ingr, qty in added['ingredients'].items():
+            items[ingr] = items.get(ingr, 0) + _quantity(qty)
     return items
 
+
+def shopping_csv(items: Dict[str, float]) -> str:
+    si = io.StringIO()
+    cw = csv.writer(si)
+    cw.writerow(['Інгредієнт', 'Кількість'])
+    for k, v in items.items():
+        cw.writerow([k, v])
+    return si.getvalue()
+
 EXPLANATION_TEMPLATES_UK = [
     "Я підібрав це меню, бо ти зараз відчуваєш '{mood}', а мета — '{goal}'. Обрані страви: {highlights}.",
     "За профілем (вага {weight} кг, зріст {height} см, активність {activity}) добова потреба — ~{cal} ккал.",
@@ -858,14 +2368,8 @@ def explain_plan_uk(plan: dict) -> str:
 # ----------------------------
 # HTML template
 # ----------------------------
-HTML_TEMPLATE = """
-<!doctype html>
-<html lang="uk">
-  <head>
-    <meta charset="utf-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1">
-    <title>AI-консультант із харчування</title>
-    <style>
+# Stylesheet and script of HTML_TEMPLATE, served as fingerprinted static assets
+APP_CSS = """
       :root{
         --bg:#f6f8fb; --card:#ffffff; --muted:#6b7280; --accent:#16a34a; --accent-2:#06b6d4;
         --glass: rgba(255,255,255,0.88);
@@ -929,295 +2433,45 @@ body.dark #page-myrecipes{
   background: linear-gradient(180deg,#07121a 0%,#04101a 100%);
 }
 
-</style>
-  </head>
-  <body>
-    <div class="wrap">
-      <header>
-        <div class="logo">AI</div>
-        <div style="flex:1">
-          <h1>AI-консультант із харчування</h1>
-          <div class="muted small">Меню під твій настрій та мету — з фото</div>
-        </div>
-        <div>
-          <button onclick="toggleDark()" style="background:transparent;border:none;cursor:pointer;font-size:18px">🌗</button>
-        </div>
-      </header>
+"""
 
-      <div id="page-home">
-        <div class="topcard">
-          <form method="post" action="/plan" id="planForm" style="width:100%">
-            <div class="controls">
-              <div class="panel">
-                <div style="display:flex;gap:8px">
-                  <div style="flex:1">
-                    <label class="small">Вік</label>
-                    <input name="age" type="number" min="10" max="120" value="{{ values.age or 30 }}">
-                  </div>
-                  <div style="width:120px">
-                    <label class="small">Стать</label>
-                    <select name="sex">
-                      <option value="male" {% if values.sex=='male' %}selected{% endif %}>Чоловік</option>
-                      <option value="female" {% if values.sex=='female' %}selected{% endif %}>Жінка</option>
-                      <option value="other" {% if values.sex=='other' %}selected{% endif %}>Інше</option>
-                    </select>
-                  </div>
-                </div>
+APP_JS = """
+      const form = document.getElementById('planForm');
+      const STORAGE_KEY = 'ai_nutrition_form_v5';
+      function saveFormToStorage(){
+        try{
+          const fd = new FormData(form);
+          const obj = {};
+          for(const [k,v] of fd.entries()) obj[k]=v;
+          localStorage.setItem(STORAGE_KEY, JSON.stringify(obj));
+        }catch(e){ console.warn('saveForm',e) }
+      }
+      function loadFormFromStorage(){
+        try{
+          const raw = localStorage.getItem(STORAGE_KEY);
+          if(!raw) return;
+          const obj = JSON.parse(raw);
+          for(const k in obj){
+            const el = form.elements[k];
+            if(!el) continue;
+            el.value = obj[k];
+          }
+        }catch(e){ console.warn('loadFormFromStorage',e) }
+      }
+      form && form.addEventListener('change', saveFormToStorage);
+      setInterval(saveFormToStorage, 2000);
+      loadFormFromStorage();
 
-                <div style="display:grid;grid-template-columns:1fr 1fr;gap:8px;margin-top:8px">
-                  <div>
-                    <label class="small">Вага (кг)</label>
-                    <input name="weight_kg" type="number" step="0.1" value="{{ values.weight_kg or 75 }}">
-                  </div>
-                  <div>
-                    <label class="small">Зріст (см)</label>
-                    <input name="height_cm" type="number" step="1" value="{{ values.height_cm or 175 }}">
-                  </div>
-                </div>
+      function copyShopping(){
+        const items = Array.from(document.querySelectorAll('#shoppingList li')).map(li => li.textContent.trim()).join('\\n');
+        navigator.clipboard && navigator.clipboard.writeText(items).then(()=>{alert('Список покупок скопійовано');}).catch(()=>{alert('Не вдалося скопіювати');});
+      }
 
-                <div style="margin-top:8px">
-                  <label class="small">Рівень активності</label>
-                  <select name="activity">
-                    <option value="sedentary" {% if values.activity=='sedentary' %}selected{% endif %}>Низька</option>
-                    <option value="office" {% if values.activity=='office' %}selected{% endif %}>Офісна</option>
-                    <option value="student" {% if values.activity=='student' %}selected{% endif %}>Учень</option>
-                    <option value="light" {% if values.activity=='light' %}selected{% endif %}>Легка</option>
-                    <option value="moderate" {% if values.activity=='moderate' %}selected{% endif %}>Помірна</option>
-                    <option value="daily-sport" {% if values.activity=='daily-sport' %}selected{% endif %}>Щоденний спорт</option>
-                    <option value="active" {% if values.activity=='active' %}selected{% endif %}>Висока</option>
-                    <option value="extreme" {% if values.activity=='extreme' %}selected{% endif %}>Екстрим</option>
-                    <option value="walk-many" {% if values.activity=='walk-many' %}selected{% endif %}>Багато ходжу</option>
-                    <option value="sport-twice" {% if values.activity=='sport-twice' %}selected{% endif %}>Спорт 2×/день</option>
-                    <option value="sitting-stress" {% if values.activity=='sitting-stress' %}selected{% endif %}>Сидяча + стрес</option>
-                    <option value="poor-sleep" {% if values.activity=='poor-sleep' %}selected{% endif %}>Поганий сон</option>
-                  </select>
-                </div>
-
-                <div style="display:flex;gap:8px;margin-top:8px">
-                  <div style="flex:1">
-                    <label class="small">Настрій</label>
-                    <select name="mood">
-                      <option value="happy" {% if values.mood=='happy' %}selected{% endif %}>Щасливий</option>
-                      <option value="stressed" {% if values.mood=='stressed' %}selected{% endif %}>Стрес</option>
-                      <option value="sad" {% if values.mood=='sad' %}selected{% endif %}>Сумний</option>
-                      <option value="energetic" {% if values.mood=='energetic' %}selected{% endif %}>Енергійний</option>
-                      <option value="hungry" {% if values.mood=='hungry' %}selected{% endif %}>Голодний</option>
-                      <option value="sleepy" {% if values.mood=='sleepy' %}selected{% endif %}>Сонний</option>
-                      <option value="want-sweet" {% if values.mood=='want-sweet' %}selected{% endif %}>Хочу солодкого</option>
-                      <option value="dont-want-cook" {% if values.mood=='dont-want-cook' %}selected{% endif %}>Не хочу готувати</option>
-                      <option value="post-workout" {% if values.mood=='post-workout' %}selected{% endif %}>Після тренування</option>
-                      <option value="creative" {% if values.mood=='creative' %}selected{% endif %}>Творчий</option>
-                    </select>
-                  </div>
-                  <div style="width:220px">
-                    <label class="small">Мета</label>
-                    <select name="goal">
-                      <option value="lose-weight" {% if values.goal=='lose-weight' %}selected{% endif %}>Схуднення</option>
-                      <option value="maintain-weight" {% if values.goal=='maintain-weight' %}selected{% endif %}>Тримати вагу</option>
-                      <option value="gain-weight" {% if values.goal=='gain-weight' %}selected{% endif %}>Набір ваги</option>
-                      <option value="build-muscle" {% if values.goal=='build-muscle' %}selected{% endif %}>Побудова м'язів</option>
-                      <option value="healthier" {% if values.goal=='healthier' %}selected{% endif %}>Здоровіше</option>
-                      <option value="more-energy" {% if values.goal=='more-energy' %}selected{% endif %}>Більше енергії</option>
-                      <option value="less-sugar" {% if values.goal=='less-sugar' %}selected{% endif %}>Менше цукру</option>
-                      <option value="cutting" {% if values.goal=='cutting' %}selected{% endif %}>Сушка</option>
-                      <option value="fast-muscle-gain" {% if values.goal=='fast-muscle-gain' %}selected{% endif %}>Швидкий набір м'язів</option>
-                      <option value="better-sleep" {% if values.goal=='better-sleep' %}selected{% endif %}>Краще засинання</option>
-                      <option value="detox" {% if values.goal=='detox' %}selected{% endif %}>Детокс</option>
-                    </select>
-                  </div>
-                </div>
-
-                <div style="margin-top:8px">
-                  
-                </div>
-              </div>
-
-              <div class="panel" style="display:flex;flex-direction:column;justify-content:space-between;gap:8px">
-                <div>
-                  <div class="small" style="margin-bottom:8px"><strong>Резерв: рецепти приховано</strong></div>
-                  <div class="small">Великий каталог рецептів приховано з головної сторінки.</div>
-                </div>
-                <div style="display:flex;flex-direction:column;gap:8px">
-                  <button type="submit" class="action">Згенерувати план</button>
-                  <button type="button" onclick="savePlan()" style="background:transparent;border:1px solid #e6eef6;padding:8px;border-radius:8px;cursor:pointer">Зберегти план</button>
-                  <a href="/export_shopping" id="exportLink" class="small">Експорт списку покупок</a>
-                </div>
-              </div>
-            </div>
-          
-            <div style="margin-top:10px">
-              <label class="small">Параметри — виключити інгредієнти (наприклад: яйця, риба, молоко)</label>
-              <input id="forbiddenInput" name="notes" placeholder="Напиши через кому що виключити..." value="{{ values.notes or '' }}">
-            </div>
-    </form>
-        </div>
-
-        {% if plan %}
-        <script>
-          window.LAST_PLAN = {{ plan | tojson | safe }};
-        </script>
-        <div style="margin-top:12px;display:flex;gap:12px">
-          <div style="flex:1">
-            <div style="display:flex;justify-content:space-between;align-items:flex-end;">
-              <div>
-                <div class="small">Дата</div>
-                <div style="font-weight:800">{{ plan.date }}</div>
-                <div class="small">Ціль: {{ plan.calorie_target }} ккал</div>
-              </div>
-              <div class="small">Профіль: {{ plan.profile.weight_kg }}кг • {{ plan.profile.height_cm }}см</div>
-            </div>
-
-            <h3 style="margin:10px 0 6px 0">Обране меню</h3>
-            <div style="display:grid;grid-template-columns:1fr;gap:8px">
-              {% for key, meal in plan.meals.items() %}
-              <div class="panel meal-panel" data-mealid="{{ meal.id }}" data-image="{{ meal.image }}">
-                {% if meal.image %}
-                  <img src="{{ meal.image }}" alt="{{ meal.name_uk }}" class="meal-img" loading="lazy">
-                {% else %}
-                  <div class="meal-img" style="display:flex;align-items:center;justify-content:center;color:#ccc">No IMG</div>
-                {% endif %}
-                <div style="flex:1">
-                  <div class="compact-key">{{ key.title() }} — {{ meal.name_uk }}</div>
-                  <div style="margin-top:6px" class="small">Інгредієнти: 
-                    {% for ik, iv in meal.ingredients.items() %}{{ ik }} — {{ iv }}{% if not loop.last %}, {% endif %}{% endfor %}
-                  </div>
-                  <div style="margin-top:6px" class="small">Кроки: 
-                    <ol style="margin:6px 0 0 18px; padding:0">
-                      {% for s in meal.steps_uk %}
-                        <li style="margin-bottom:4px;font-size:13px">{{ s }}</li>
-                      {% endfor %}
-                    </ol>
-                  </div>
-                </div>
-                <div style="min-width:110px;text-align:right">
-                  <div style="font-weight:700">{{ meal.nutrition.calories }} ккал</div>
-                  <div class="small">Б {{ meal.nutrition.protein }} • В {{ meal.nutrition.carbs }} • Ж {{ meal.nutrition.fats }}</div>
-                  <div style="margin-top:8px;display:flex;flex-direction:column;gap:6px">
-                    <button onclick="showFullRecipe('{{ meal.id }}')" style="background:transparent;border:none;cursor:pointer">Як приготувати</button>
-                    <button onclick="saveRecipeToMyRecipes('{{ meal.id }}','{{ meal.name_uk|escape }}')" style="background:transparent;border:none;cursor:pointer">Зберегти рецепт</button>
-                  </div>
-                </div>
-              </div>
-              {% endfor %}
-            </div>
-          </div>
-
-          <aside style="width:320px;display:flex;flex-direction:column;gap:8px">
-            <div class="panel">
-              <h4 style="margin:0 0 8px 0">Пояснення</h4>
-              <pre style="white-space:pre-wrap;font-family:inherit;margin:0" class="small">{{ explanation }}</pre>
-            </div>
-
-            <div class="panel">
-              <div style="display:flex;justify-content:space-between;align-items:center">
-                <h4 style="margin:0">Список покупок</h4>
-                <div>
-                  <button onclick="copyShopping()" style="background:transparent;border:none;cursor:pointer" class="small">Копіювати</button>
-                  <a href="/download_shopping" target="_blank" class="small" style="margin-left:6px">CSV</a>
-                </div>
-              </div>
-              <ul id="shoppingList" style="margin-top:8px;font-size:13px">
-                {% for k, v in shopping.items() %}
-                  <li>{{ k }} — {{ v }}</li>
-                {% endfor %}
-              </ul>
-            </div>
-          </aside>
-        </div>
-        {% else %}
-        <script>
-          window.LAST_PLAN = null;
-        </script>
-        {% endif %}
-
-        </div>
-
-      
-      <div id="page-parameters" class="hidden">
-        <div class="panel">
-          <h3>Параметри</h3>
-          <div class="small muted">Виключити інгредієнти (наприклад: яйця, риба, молоко)</div>
-          <div style="margin-top:8px">
-            
-          </div>
-          <div style="margin-top:10px; display:flex; gap:8px;">
-            <button onclick="saveParams()" class="action">Зберегти параметри</button>
-            <button onclick="clearParams()" style="background:transparent;border:1px solid #e6eef6;padding:8px;border-radius:8px;cursor:pointer">Очистити</button>
-          </div>
-        </div>
-      </div>
-<div id="page-myrecipes" class="hidden">
-        <div class="panel">
-          <h3>Мої збережені рецепти та плани</h3>
-          <div id="myRecipesList" class="small muted">Тут будуть збережені рецепти та плани (localStorage).</div>
-        </div>
-      </div>
-
-      <div id="page-profile" class="hidden">
-        <div class="panel">
-          <h3>Профіль</h3>
-          <div class="small muted">Налаштування профілю (локально).</div>
-          <div style="margin-top:8px;display:flex;gap:8px">
-            <button onclick="clearSavedData()" style="background:transparent;border:1px solid #e6eef6;padding:8px;border-radius:8px;cursor:pointer">Очистити збережені дані</button>
-            <button onclick="exportAllSaved()" class="action">Експорт усіх планів</button>
-          </div>
-        </div>
-      </div>
-
-      <div id="fullRecipeModal" class="full-recipe-modal hidden" aria-hidden="true">
-        <div style="position:relative">
-          <div class="modal-close" onclick="closeFullRecipe()">✕</div>
-          <img id="fullRecipeImage" class="modal-img-banner hidden">
-          <h3 id="fullRecipeTitle">Рецепт</h3>
-          <div id="fullRecipeBody" class="small"></div>
-        </div>
-      </div>
-
-    </div>
-
-    <div class="bottom-nav" role="navigation">
-      <button class="nav-btn active" id="nav-home" onclick="showPage('home')">Головна</button>
-      <button class="nav-btn" id="nav-myrecipes" onclick="showPage('myrecipes')">Мої рецепти</button>
-      
-    </div>
-
-    <script>
-      const form = document.getElementById('planForm');
-      const STORAGE_KEY = 'ai_nutrition_form_v5';
-      function saveFormToStorage(){
-        try{
-          const fd = new FormData(form);
-          const obj = {};
-          for(const [k,v] of fd.entries()) obj[k]=v;
-          localStorage.setItem(STORAGE_KEY, JSON.stringify(obj));
-        }catch(e){ console.warn('saveForm',e) }
-      }
-      function loadFormFromStorage(){
-        try{
-          const raw = localStorage.getItem(STORAGE_KEY);
-          if(!raw) return;
-          const obj = JSON.parse(raw);
-          for(const k in obj){
-            const el = form.elements[k];
-            if(!el) continue;
-            el.value = obj[k];
-          }
-        }catch(e){ console.warn('loadFormFromStorage',e) }
-      }
-      form && form.addEventListener('change', saveFormToStorage);
-      setInterval(saveFormToStorage, 2000);
-      loadFormFromStorage();
-
-      function copyShopping(){
-        const items = Array.from(document.querySelectorAll('#shoppingList li')).map(li => li.textContent.trim()).join('\\n');
-        navigator.clipboard && navigator.clipboard.writeText(items).then(()=>{alert('Список покупок скопійовано');}).catch(()=>{alert('Не вдалося скопіювати');});
-      }
-
-      function toggleDark(){
-        document.body.classList.toggle('dark');
-        localStorage.setItem('ai_theme_dark', document.body.classList.contains('dark'));
-      }
-      if(localStorage.getItem('ai_theme_dark') === 'true') document.body.classList.add('dark');
+      function toggleDark(){
+        document.body.classList.toggle('dark');
+        localStorage.setItem('ai_theme_dark', document.body.classList.contains('dark'));
+      }
+      if(localStorage.getItem('ai_theme_dark') === 'true') document.body.classList.add('dark');
 
       // Parameters (forbidden ingredients) persistence
       function saveParams(){
@@ -1282,6 +2536,25 @@ body.dark #page-myrecipes{
         }catch(e){ console.warn(e); alert('Не вдалося зберегти план');}
       }
 
+      // the plan lives in the page, so it is posted back: any server worker can then build the CSV
+      function postLastPlan(ev, link){
+        if(!window.LAST_PLAN) return true;
+        ev.preventDefault();
+        const f = document.createElement('form');
+        f.method = 'post';
+        f.action = link.getAttribute('href');
+        if(link.target) f.target = link.target;
+        const inp = document.createElement('input');
+        inp.type = 'hidden';
+        inp.name = 'plan';
+        inp.value = JSON.stringify(window.LAST_PLAN);
+        f.appendChild(inp);
+        document.body.appendChild(f);
+        f.submit();
+        f.remove();
+        return false;
+      }
+
       function saveRecipeToMyRecipes(id, name){
         try{
           const rawRecipes = localStorage.getItem('ai_my_recipes') || '[]';
@@ -1560,142 +2833,1212 @@ body.dark #page-myrecipes{
           document.getElementById('fullRecipeModal').classList.remove('hidden');
         }catch(e){ alert('Не вдалося відкрити рецепт'); }
       }
-    </script>
-  </body>
-</html>
 """
 
-# ----------------------------
-# Flask endpoints
-# ----------------------------
-def run_flask(host='127.0.0.1', port=5000):
-    if not FLASK_AVAILABLE:
-        print("Flask is not installed. Install with: pip install flask")
-        return
-    load_sample_recipes()
-    app = Flask(__name__)
-    planner = MenuPlanner(RECIPES)
-
-    SERVER_STATE = {'last_plan': None, 'last_shopping_csv': None}
-
-    @app.route('/', methods=['GET'])
-    def index():
-        values = DEFAULT_PROFILE.copy()
-        values.update({'mood': 'happy', 'goal': 'maintain-weight', 'notes': ''})
-        return render_template_string(HTML_TEMPLATE, values=values, RECIPES=RECIPES)
-
-    @app.route('/plan', methods=['POST'])
-    def plan():
-        try:
-            profile = {
-                'age': int(request.form.get('age', 30)),
-                'sex': request.form.get('sex', 'male'),
-                'weight_kg': float(request.form.get('weight_kg', 75)),
-                'height_cm': float(request.form.get('height_cm', 175)),
-                'activity': request.form.get('activity', 'moderate'),
-            }
-        except Exception:
-            profile = DEFAULT_PROFILE.copy()
-        mood = request.form.get('mood', 'happy')
-        goal = request.form.get('goal', 'maintain-weight')
-        notes = request.form.get('notes', '')
-        forbidden = []
-        if notes:
-            parts = []
-            for part in notes.split(','):
-                for sub in part.split(';'):
-                    parts.extend(sub.split('/'))
-            forbidden = [p.strip().lower() for p in parts if p.strip()]
-        the_plan = planner.generate_plan(mood, goal, profile, forbidden)
-        shopping = build_shopping_list(the_plan)
-        explanation = explain_plan_uk(the_plan)
-        values = profile.copy()
-        values.update({'mood': mood, 'goal': goal, 'notes': notes})
-        try:
-            si = io.StringIO()
-            cw = csv.writer(si)
-            cw.writerow(['Інгредієнт', 'Кількість'])
-            for k, v in shopping.items():
-                cw.writerow([k, v])
-            SERVER_STATE['last_shopping_csv'] = si.getvalue()
-            SERVER_STATE['last_plan'] = the_plan
-        except Exception:
-            SERVER_STATE['last_shopping_csv'] = None
-        return render_template_string(HTML_TEMPLATE, plan=the_plan, shopping=shopping, explanation=explanation, values=values, RECIPES=RECIPES)
+# name -> (source, content type) of the assets HTML_TEMPLATE links to via asset_url()
+STATIC_ASSETS = {
+    'app.css': (APP_CSS, 'text/css; charset=utf-8'),
+    'app.js': (APP_JS, 'text/javascript; charset=utf-8'),
+}
 
-    @app.route('/export_shopping', methods=['GET'])
-    def export_shopping():
-        txt = SERVER_STATE.get('last_shopping_csv') or ''
-        if not txt:
-            return "Немає списку покупок. Згенеруйте план спочатку.", 400
-        resp = make_response(txt)
-        resp.headers["Content-Disposition"] = "attachment; filename=shopping.csv"
-        resp.headers["Content-Type"] = "text/csv; charset=utf-8"
-        return resp
 
-    @app.route('/download_shopping', methods=['GET'])
-    def download_shopping():
-        txt = SERVER_STATE.get('last_shopping_csv') or ''
-        if not txt:
-            return "Немає списку покупок.", 400
-        mem = io.BytesIO()
-        mem.write(txt.encode('utf-8'))
-        mem.seek(0)
-        return send_file(mem, mimetype='text/csv', as_attachment=True, download_name='shopping.csv')
+def fingerprint_assets(assets: Dict[str, tuple]) -> Dict[str, tuple]:
+    """Map each asset name to (content-hashed file name, body bytes, content type)."""
+    out = {}
+    for name, (source, content_type) in assets.items():
+        body = source.encode('utf-8')
+        stem, ext = os.path.splitext(name)
+        out[name] = (f'{stem}.{hashlib.sha256(body).hexdigest()[:12]}{ext}', body, content_type)
+    return out
 
-    @app.route('/api/plan', methods=['POST'])
-    def api_plan():
-        payload = request.get_json(force=True)
-        profile = {
-            'age': int(payload.get('age', 30)),
-            'sex': payload.get('sex', 'male'),
-            'weight_kg': float(payload.get('weight_kg', 75)),
-            'height_cm': float(payload.get('height_cm', 175)),
-            'activity': payload.get('activity', 'moderate'),
-        }
-        mood = payload.get('mood', 'happy')
-        goal = payload.get('goal', 'maintain-weight')
-        forbidden = payload.get('forbidden', []) or []
-        the_plan = planner.generate_plan(mood, goal, profile, forbidden)
-        return jsonify(the_plan)
+HTML_TEMPLATE = """
+<!doctype html>
+<html lang="uk">
+  <head>
+    <meta charset="utf-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1">
+    <title>AI-консультант із харчування</title>
+    <link rel="stylesheet" href="{{ asset_url('app.css') }}">
+  </head>
+  <body>
+    <div class="wrap">
+      <header>
+        <div class="logo">AI</div>
+        <div style="flex:1">
+          <h1>AI-консультант із харчування</h1>
+          <div class="muted small">Меню під твій настрій та мету — з фото</div>
+        </div>
+        <div>
+          <button onclick="toggleDark()" style="background:transparent;border:none;cursor:pointer;font-size:18px">🌗</button>
+        </div>
+      </header>
 
-    @app.route('/save_plan', methods=['POST'])
-    def save_plan():
-        payload = request.get_json(force=True)
+      <div id="page-home">
+        <div class="topcard">
+          <form method="post" action="/plan" id="planForm" style="width:100%">
+            <div class="controls">
+              <div class="panel">
+                <div style="display:flex;gap:8px">
+                  <div style="flex:1">
+                    <label class="small">Вік</label>
+                    <input name="age" type="number" min="10" max="120" value="{{ values.age or 30 }}">
+                  </div>
+                  <div style="width:120px">
+                    <label class="small">Стать</label>
+                    <select name="sex">
+                      <option value="male" {% if values.sex=='male' %}selected{% endif %}>Чоловік</option>
+                      <option value="female" {% if values.sex=='female' %}selected{% endif %}>Жінка</option>
+                      <option value="other" {% if values.sex=='other' %}selected{% endif %}>Інше</option>
+                    </select>
+                  </div>
+                </div>
+
+                <div style="display:grid;grid-template-columns:1fr 1fr;gap:8px;margin-top:8px">
+                  <div>
+                    <label class="small">Вага (кг)</label>
+                    <input name="weight_kg" type="number" step="0.1" value="{{ values.weight_kg or 75 }}">
+                  </div>
+                  <div>
+                    <label class="small">Зріст (см)</label>
+                    <input name="height_cm" type="number" step="1" value="{{ values.height_cm or 175 }}">
+                  </div>
+                </div>
+
+                <div style="margin-top:8px">
+                  <label class="small">Рівень активності</label>
+                  <select name="activity">
+                    <option value="sedentary" {% if values.activity=='sedentary' %}selected{% endif %}>Низька</option>
+                    <option value="office" {% if values.activity=='office' %}selected{% endif %}>Офісна</option>
+                    <option value="student" {% if values.activity=='student' %}selected{% endif %}>Учень</option>
+                    <option value="light" {% if values.activity=='light' %}selected{% endif %}>Легка</option>
+                    <option value="moderate" {% if values.activity=='moderate' %}selected{% endif %}>Помірна</option>
+                    <option value="daily-sport" {% if values.activity=='daily-sport' %}selected{% endif %}>Щоденний спорт</option>
+                    <option value="active" {% if values.activity=='active' %}selected{% endif %}>Висока</option>
+                    <option value="extreme" {% if values.activity=='extreme' %}selected{% endif %}>Екстрим</option>
+                    <option value="walk-many" {% if values.activity=='walk-many' %}selected{% endif %}>Багато ходжу</option>
+                    <option value="sport-twice" {% if values.activity=='sport-twice' %}selected{% endif %}>Спорт 2×/день</option>
+                    <option value="sitting-stress" {% if values.activity=='sitting-stress' %}selected{% endif %}>Сидяча + стрес</option>
+                    <option value="poor-sleep" {% if values.activity=='poor-sleep' %}selected{% endif %}>Поганий сон</option>
+                  </select>
+                </div>
+
+                <div style="display:flex;gap:8px;margin-top:8px">
+                  <div style="flex:1">
+                    <label class="small">Настрій</label>
+                    <select name="mood">
+                      <option value="happy" {% if values.mood=='happy' %}selected{% endif %}>Щасливий</option>
+                      <option value="stressed" {% if values.mood=='stressed' %}selected{% endif %}>Стрес</option>
+                      <option value="sad" {% if values.mood=='sad' %}selected{% endif %}>Сумний</option>
+                      <option value="energetic" {% if values.mood=='energetic' %}selected{% endif %}>Енергійний</option>
+                      <option value="hungry" {% if values.mood=='hungry' %}selected{% endif %}>Голодний</option>
+                      <option value="sleepy" {% if values.mood=='sleepy' %}selected{% endif %}>Сонний</option>
+                      <option value="want-sweet" {% if values.mood=='want-sweet' %}selected{% endif %}>Хочу солодкого</option>
+                      <option value="dont-want-cook" {% if values.mood=='dont-want-cook' %}selected{% endif %}>Не хочу готувати</option>
+                      <option value="post-workout" {% if values.mood=='post-workout' %}selected{% endif %}>Після тренування</option>
+                      <option value="creative" {% if values.mood=='creative' %}selected{% endif %}>Творчий</option>
+                    </select>
+                  </div>
+                  <div style="width:220px">
+                    <label class="small">Мета</label>
+                    <select name="goal">
+                      <option value="lose-weight" {% if values.goal=='lose-weight' %}selected{% endif %}>Схуднення</option>
+                      <option value="maintain-weight" {% if values.goal=='maintain-weight' %}selected{% endif %}>Тримати вагу</option>
+                      <option value="gain-weight" {% if values.goal=='gain-weight' %}selected{% endif %}>Набір ваги</option>
+                      <option value="build-muscle" {% if values.goal=='build-muscle' %}selected{% endif %}>Побудова м'язів</option>
+                      <option value="healthier" {% if values.goal=='healthier' %}selected{% endif %}>Здоровіше</option>
+                      <option value="more-energy" {% if values.goal=='more-energy' %}selected{% endif %}>Більше енергії</option>
+                      <option value="less-sugar" {% if values.goal=='less-sugar' %}selected{% endif %}>Менше цукру</option>
+                      <option value="cutting" {% if values.goal=='cutting' %}selected{% endif %}>Сушка</option>
+                      <option value="fast-muscle-gain" {% if values.goal=='fast-muscle-gain' %}selected{% endif %}>Швидкий набір м'язів</option>
+                      <option value="better-sleep" {% if values.goal=='better-sleep' %}selected{% endif %}>Краще засинання</option>
+                      <option value="detox" {% if values.goal=='detox' %}selected{% endif %}>Детокс</option>
+                    </select>
+                  </div>
+                </div>
+
+                <div style="margin-top:8px">
+                  
+                </div>
+              </div>
+
+              <div class="panel" style="display:flex;flex-direction:column;justify-content:space-between;gap:8px">
+                <div>
+                  <div class="small" style="margin-bottom:8px"><strong>Резерв: рецепти приховано</strong></div>
+                  <div class="small">Великий каталог рецептів приховано з головної сторінки.</div>
+                </div>
+                <div style="display:flex;flex-direction:column;gap:8px">
+                  <button type="submit" class="action">Згенерувати план</button>
+                  <button type="button" onclick="savePlan()" style="background:transparent;border:1px solid #e6eef6;padding:8px;border-radius:8px;cursor:pointer">Зберегти план</button>
+                  <a href="/export_shopping" id="exportLink" class="small" onclick="return postLastPlan(event, this)">Експорт списку покупок</a>
+                </div>
+              </div>
+            </div>
+          
+            <div style="margin-top:10px">
+              <label class="small">Параметри — виключити інгредієнти (наприклад: яйця, риба, молоко)</label>
+              <input id="forbiddenInput" name="notes" placeholder="Напиши через кому що виключити..." value="{{ values.notes or '' }}">
+            </div>
+    </form>
+        </div>
+
+        {# /plan streams everything above before the plan is built #}
+        {% if plan_section is defined %}{% set plan, shopping, explanation = plan_section() %}{% endif %}
+        {% if plan %}
+        <script>
+          window.LAST_PLAN = {{ plan | tojson | safe }};
+        </script>
+        <div style="margin-top:12px;display:flex;gap:12px">
+          <div style="flex:1">
+            <div style="display:flex;justify-content:space-between;align-items:flex-end;">
+              <div>
+                <div class="small">Дата</div>
+                <div style="font-weight:800">{{ plan.date }}</div>
+                <div class="small">Ціль: {{ plan.calorie_target }} ккал</div>
+              </div>
+              <div class="small">Профіль: {{ plan.profile.weight_kg }}кг • {{ plan.profile.height_cm }}см</div>
+            </div>
+
+            <h3 style="margin:10px 0 6px 0">Обране меню</h3>
+            <div style="display:grid;grid-template-columns:1fr;gap:8px">
+              {% for key, meal in plan.meals.items() %}
+              <div class="panel meal-panel" data-mealid="{{ meal.id }}" data-image="{{ meal.image }}">
+                {% if meal.image %}
+                  <img src="{{ meal.image }}" alt="{{ meal.name_uk }}" class="meal-img" loading="lazy">
+                {% else %}
+                  <div class="meal-img" style="display:flex;align-items:center;justify-content:center;color:#ccc">No IMG</div>
+                {% endif %}
+                <div style="flex:1">
+                  <div class="compact-key">{{ key.title() }} — {{ meal.name_uk }}</div>
+                  <div style="margin-top:6px" class="small">Інгредієнти: 
+                    {% for ik, iv in meal.ingredients.items() %}{{ ik }} — {{ iv }}{% if not loop.last %}, {% endif %}{% endfor %}
+                  </div>
+                  <div style="margin-top:6px" class="small">Кроки: 
+                    <ol style="margin:6px 0 0 18px; padding:0">
+                      {% for s in meal.steps_uk %}
+                        <li style="margin-bottom:4px;font-size:13px">{{ s }}</li>
+                      {% endfor %}
+                    </ol>
+                  </div>
+                </div>
+                <div style="min-width:110px;text-align:right">
+                  <div style="font-weight:700">{{ meal.nutrition.calories }} ккал</div>
+                  <div class="small">Б {{ meal.nutrition.protein }} • В {{ meal.nutrition.carbs }} • Ж {{ meal.nutrition.fats }}</div>
+                  <div style="margin-top:8px;display:flex;flex-direction:column;gap:6px">
+                    <button onclick="showFullRecipe('{{ meal.id }}')" style="background:transparent;border:none;cursor:pointer">Як приготувати</button>
+                    <button onclick="saveRecipeToMyRecipes('{{ meal.id }}','{{ meal.name_uk|escape }}')" style="background:transparent;border:none;cursor:pointer">Зберегти рецепт</button>
+                  </div>
+                </div>
+              </div>
+              {% endfor %}
+            </div>
+          </div>
+
+          <aside style="width:320px;display:flex;flex-direction:column;gap:8px">
+            <div class="panel">
+              <h4 style="margin:0 0 8px 0">Пояснення</h4>
+              <pre style="white-space:pre-wrap;font-family:inherit;margin:0" class="small">{{ explanation }}</pre>
+            </div>
+
+            <div class="panel">
+              <div style="display:flex;justify-content:space-between;align-items:center">
+                <h4 style="margin:0">Список покупок</h4>
+                <div>
+                  <button onclick="copyShopping()" style="background:transparent;border:none;cursor:pointer" class="small">Копіювати</button>
+                  <a href="/download_shopping" target="_blank" class="small" style="margin-left:6px" onclick="return postLastPlan(event, this)">CSV</a>
+                </div>
+              </div>
+              <ul id="shoppingList" style="margin-top:8px;font-size:13px">
+                {% for k, v in shopping.items() %}
+                  <li>{{ k }} — {{ v }}</li>
+                {% endfor %}
+              </ul>
+            </div>
+          </aside>
+        </div>
+        {% else %}
+        <script>
+          window.LAST_PLAN = null;
+        </script>
+        {% endif %}
+
+        </div>
+
+      
+      <div id="page-parameters" class="hidden">
+        <div class="panel">
+          <h3>Параметри</h3>
+          <div class="small muted">Виключити інгредієнти (наприклад: яйця, риба, молоко)</div>
+          <div style="margin-top:8px">
+            
+          </div>
+          <div style="margin-top:10px; display:flex; gap:8px;">
+            <button onclick="saveParams()" class="action">Зберегти параметри</button>
+            <button onclick="clearParams()" style="background:transparent;border:1px solid #e6eef6;padding:8px;border-radius:8px;cursor:pointer">Очистити</button>
+          </div>
+        </div>
+      </div>
+<div id="page-myrecipes" class="hidden">
+        <div class="panel">
+          <h3>Мої збережені рецепти та плани</h3>
+          <div id="myRecipesList" class="small muted">Тут будуть збережені рецепти та плани (localStorage).</div>
+        </div>
+      </div>
+
+      <div id="page-profile" class="hidden">
+        <div class="panel">
+          <h3>Профіль</h3>
+          <div class="small muted">Налаштування профілю (локально).</div>
+          <div style="margin-top:8px;display:flex;gap:8px">
+            <button onclick="clearSavedData()" style="background:transparent;border:1px solid #e6eef6;padding:8px;border-radius:8px;cursor:pointer">Очистити збережені дані</button>
+            <button onclick="exportAllSaved()" class="action">Експорт усіх планів</button>
+          </div>
+        </div>
+      </div>
+
+      <div id="fullRecipeModal" class="full-recipe-modal hidden" aria-hidden="true">
+        <div style="position:relative">
+          <div class="modal-close" onclick="closeFullRecipe()">✕</div>
+          <img id="fullRecipeImage" class="modal-img-banner hidden">
+          <h3 id="fullRecipeTitle">Рецепт</h3>
+          <div id="fullRecipeBody" class="small"></div>
+        </div>
+      </div>
+
+    </div>
+
+    <div class="bottom-nav" role="navigation">
+      <button class="nav-btn active" id="nav-home" onclick="showPage('home')">Головна</button>
+      <button class="nav-btn" id="nav-myrecipes" onclick="showPage('myrecipes')">Мої рецепти</button>
+      
+    </div>
+
+    <script src="{{ asset_url('app.js') }}"></script>
+  </body>
+</html>
+"""
+
+# ----------------------------
+# Flask endpoints
+# ----------------------------
+# longest plan and most alternative days /api/plan will generate in one request
+MAX_PLAN_DAYS = 31
+MAX_ALTERNATIVES = 5
+# fingerprinted assets never change under the same URL
+ASSET_MAX_AGE = 365 * 24 * 3600
+
+
+@dataclass
+class CachedResponse:
+    content_type: str
+    # strong validator of the identity body; encoded variants get "<etag>-<encoding>"
+    etag: str
+    # content coding ('identity', 'gzip', 'br') -> body
+    variants: Dict[str, bytes]
+
+    def tag(self, encoding: str) -> str:
+        return self.etag if encoding == 'identity' else f'{self.etag}-{encoding}'
+
+    @property
+    def size(self) -> int:
+        return sum(len(v) for v in self.variants.values())
+
+
+class ResponseCache:
+    """In-process LRU cache of rendered bodies with their ETags and precompressed variants, bounded in bytes."""
+
+    # bodies below this many bytes are only kept uncompressed
+    MIN_COMPRESS = 512
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def encode(cls, body: bytes) -> Dict[str, bytes]:
+        variants = {'identity': body}
+        if len(body) >= cls.MIN_COMPRESS:
+            variants['gzip'] = gzip.compress(body, compresslevel=9, mtime=0)
+            if BROTLI_AVAILABLE:
+                variants['br'] = brotli.compress(body)
+        return variants
+
+    def get(self, key) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, body: bytes, content_type: str) -> CachedResponse:
+        """Store `body` and return its entry; bodies larger than the whole cache are returned unstored."""
+        entry = CachedResponse(content_type, hashlib.sha256(body).hexdigest()[:32], self.encode(body))
+        if entry.size > self.max_bytes:
+            return entry
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.bytes -= old.size
+            self._data[key] = entry
+            self.bytes += entry.size
+            while self.bytes > self.max_bytes:
+                _, dropped = self._data.popitem(last=False)
+                self.bytes -= dropped.size
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {'size': len(self._data), 'bytes': self.bytes, 'max_bytes': self.max_bytes,
+                    'hits': self.hits, 'misses': self.misses,
+                    'hit_rate': (self.hits / total) if total else 0.0}
+
+
+def negotiate(entry: CachedResponse, accept_encoding: Optional[str], if_none_match: Optional[str],
+              cache_control: str = 'no-cache') -> tuple:
+    """(status, body, headers) sending `entry` in the best encoding the client accepts,
+    or 304 if its If-None-Match already has the body.
+    """
+    accepted = parse_accept_header(accept_encoding)
+    encoding = next((e for e in ('br', 'gzip') if e in entry.variants and accepted[e]), 'identity')
+    conditions = parse_etags(if_none_match)
+    headers = {'ETag': quote_etag(entry.tag(encoding)), 'Vary': 'Accept-Encoding', 'Cache-Control': cache_control}
+    if conditions.star_tag or any(conditions.contains(entry.tag(e)) for e in entry.variants):
+        return 304, b'', headers
+    headers['Content-Type'] = entry.content_type
+    if encoding != 'identity':
+        headers['Content-Encoding'] = encoding
+    return 200, entry.variants[encoding], headers
+
+
+def plan_response_key(payload: dict) -> Optional[tuple]:
+    """ResponseCache key of an /api/plan payload, or None if its plan may differ between calls."""
+    # a seeded plan is the same for the whole day, unless a time budget may cut it short
+    if parse_seed(payload.get('seed')) is not None and payload.get('time_budget_ms') is None:
+        return ('api_plan', datetime.date.today().isoformat(), json.dumps(payload, sort_keys=True, default=str))
+    return None
+
+
+def plan_for_payload(planner: MenuPlanner, payload: dict, calorie_target: Optional[int] = None,
+                     pools: Optional[Dict[str, _CategoryPool]] = None) -> dict:
+    """The /api/plan result for `payload`: one day, or generate_week() when it asks for several."""
+    profile = profile_from_payload(payload)
+    mood = payload.get('mood', 'happy')
+    goal = payload.get('goal', 'maintain-weight')
+    forbidden = forbidden_from_payload(payload)
+    seed = parse_seed(payload.get('seed'))
+    mode = 'optimize' if payload.get('mode') == 'optimize' else 'greedy'
+    try:
+        time_budget = float(payload['time_budget_ms']) / 1000 if payload.get('time_budget_ms') is not None else None
+    except (TypeError, ValueError):
+        time_budget = None
+    try:
+        days = min(max(int(payload.get('days') or 1), 1), MAX_PLAN_DAYS)
+    except (TypeError, ValueError):
+        days = 1
+    try:
+        alternatives = min(max(int(payload.get('alternatives') or 0), 0), MAX_ALTERNATIVES)
+    except (TypeError, ValueError):
+        alternatives = 0
+    if days > 1:
+        return planner.generate_week(mood, goal, profile, forbidden, days=days, seed=seed, mode=mode,
+                                     time_budget=time_budget)
+    return planner.generate_plan(mood, goal, profile, forbidden, seed=seed, mode=mode,
+                                 time_budget=time_budget, alternatives=alternatives,
+                                 calorie_target=calorie_target, pools=pools)
+
+
+def plan_is_final(result: dict) -> bool:
+    """False for a plan the optimizer's deadline cut short; such plans are not cached."""
+    return (result.get('optimizer') or {}).get('optimal', True)
+
+
+class RatingJournal:
+    """Append-only file of ratings, replayed in the same order by every worker process of one server."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.offset = 0
+        self._lock = threading.Lock()
+
+    def append(self, recipe_id: str, value: float):
+        # a single O_APPEND write, so lines from concurrent workers never interleave
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+        try:
+            os.write(fd, (json.dumps([recipe_id, value]) + '\n').encode('utf-8'))
+        finally:
+            os.close(fd)
+
+    def replay(self, apply) -> int:
+        """Call apply(recipe_id, value) for every line added since the last replay; returns how many."""
+        try:
+            if os.stat(self.path).st_size <= self.offset:
+                return 0
+        except FileNotFoundError:
+            return 0
+        with self._lock:
+            with open(self.path, 'rb') as f:
+                f.seek(self.offset)
+                data = f.read()
+            # a line still being written is picked up next time
+            data = data[:data.rfind(b'\n') + 1]
+            self.offset += len(data)
+            lines = data.splitlines()
+            for line in lines:
+                recipe_id, value = json.loads(line)
+                apply(recipe_id, value)
+        return len(lines)
+
+
+def replay_ratings(planner: MenuPlanner, responses: ResponseCache, ratings: RatingJournal) -> None:
+    """Apply ratings other workers have journaled, dropping cached bodies if there were any."""
+    if ratings.replay(planner.rate_recipe):
+        responses.clear()
+
+
+def rate_from_form(planner: MenuPlanner, responses: ResponseCache, form,
+                   ratings: Optional[RatingJournal] = None) -> tuple:
+    """(JSON body, status) of /rate for the posted recipe_id and value, through `ratings` when given."""
+    recipe_id = form.get('recipe_id')
+    try:
+        value = float(form.get('value', '0'))
+    except Exception:
+        value = 0.0
+    if ratings is None:
+        found = planner.rate_recipe(recipe_id, value)
+    else:
+        row = planner.catalog.index.get(recipe_id)
+        found = None
+        if row is not None:
+            ratings.append(recipe_id, value)
+            replay_ratings(planner, responses, ratings)
+            found = planner.catalog.recipe(row)
+    if not found:
+        return {'ok': False, 'error': 'recipe not found'}, 404
+    responses.clear()
+    return {'ok': True, 'rating': found.rating, 'votes': found.votes}, 200
+
+
+def saved_plan_path() -> str:
+    return os.path.join(os.getcwd(), f"saved_plan_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+
+
+def write_saved_plan(path: str, payload) -> None:
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, ensure_ascii=False, indent=2)
+
+
+def create_app(catalog_path: Optional[str] = None, ratings_path: Optional[str] = None) -> 'Flask':
+    """The web app: the page, its assets and the JSON API over one shared planner.
+
+    With `ratings_path` ratings go through a RatingJournal, so several processes can serve the app.
+    """
+    app = Flask(__name__, static_folder=None)
+    assets = fingerprint_assets(STATIC_ASSETS)
+    served = {path: (body, content_type) for path, body, content_type in assets.values()}
+    app.jinja_env.globals['asset_url'] = lambda name: '/assets/' + assets[name][0]
+    # compiled once here instead of on every render_template_string() call
+    page = app.jinja_env.from_string(HTML_TEMPLATE)
+    planner = MenuPlanner(catalog=RecipeCatalog.open(catalog_path or SAMPLE_CATALOG_PATH), plan_cache=PlanCache(), shortlists=True)
+    planner.shortlists.warm()
+    # the index page, the assets and seeded /api/plan bodies; cleared when a rating changes
+    responses = ResponseCache()
+
+    def cached_response(entry: CachedResponse, cache_control: str = 'no-cache'):
+        status, body, headers = negotiate(entry, request.headers.get('Accept-Encoding'),
+                                          request.headers.get('If-None-Match'), cache_control)
+        return Response(body, status=status, headers=headers)
+
+    ratings = RatingJournal(ratings_path) if ratings_path else None
+    app.extensions['nutrition'] = {'planner': planner, 'responses': responses, 'ratings': ratings}
+
+    if ratings is not None:
+        @app.before_request
+        def replay_journal():
+            replay_ratings(planner, responses, ratings)
+
+    def posted_shopping() -> Optional[Dict[str, float]]:
+        """Shopping list of the plan posted back by the page (form field 'plan') or as JSON {'plan', 'shopping'}."""
+        if request.is_json:
+            payload = request.get_json(silent=True) or {}
+        else:
+            raw = request.form.get('plan')
+            payload = {'plan': json.loads(raw)} if raw else {}
+        shopping = payload.get('shopping')
+        if shopping is None and payload.get('plan'):
+            shopping = build_shopping_list(payload['plan'])
+        return shopping
+
+    @app.route('/', methods=['GET'])
+    def index():
+        entry = responses.get(('index',))
+        if entry is None:
+            values = DEFAULT_PROFILE.copy()
+            values.update({'mood': 'happy', 'goal': 'maintain-weight', 'notes': ''})
+            entry = responses.put(('index',), render_template(page, values=values).encode('utf-8'),
+                                  'text/html; charset=utf-8')
+        return cached_response(entry)
+
+    @app.route('/plan', methods=['POST'])
+    def plan():
+        """The page with the planned day, streamed: header and form go out before planning starts."""
+        try:
+            profile = profile_from_payload(request.form)
+        except Exception:
+            profile = DEFAULT_PROFILE.copy()
+        mood = request.form.get('mood', 'happy')
+        goal = request.form.get('goal', 'maintain-weight')
+        notes = request.form.get('notes', '')
+        forbidden = split_forbidden(notes) if notes else []
+        seed = parse_seed(request.form.get('seed'))
+        values = profile.copy()
+        values.update({'mood': mood, 'goal': goal, 'notes': notes})
+
+        def plan_section():
+            # called by the template once the part above the plan has been sent
+            the_plan = planner.generate_plan(mood, goal, profile, forbidden, seed=seed)
+            return the_plan, build_shopping_list(the_plan), explain_plan_uk(the_plan)
+
+        resp = Response(stream_template(page, values=values, plan_section=plan_section),
+                        content_type='text/html; charset=utf-8')
+        # let proxies pass the head of the page on instead of waiting for the whole body
+        resp.headers['X-Accel-Buffering'] = 'no'
+        return resp
+
+    @app.route('/assets/<name>', methods=['GET'])
+    def asset(name):
+        hit = served.get(name)
+        if hit is None:
+            return "Not found", 404
+        entry = responses.get(('asset', name)) or responses.put(('asset', name), *hit)
+        return cached_response(entry, f'public, max-age={ASSET_MAX_AGE}, immutable')
+
+    @app.route('/export_shopping', methods=['GET', 'POST'])
+    def export_shopping():
         try:
-            path = os.path.join(os.getcwd(), f"saved_plan_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
-            with open(path, 'w', encoding='utf-8') as f:
-                json.dump(payload, f, ensure_ascii=False, indent=2)
+            shopping = posted_shopping()
+        except (AttributeError, KeyError, TypeError, ValueError):
+            return "Некоректний план.", 400
+        if not shopping:
+            return "Немає списку покупок. Згенеруйте план спочатку.", 400
+        resp = make_response(shopping_csv(shopping))
+        resp.headers["Content-Disposition"] = "attachment; filename=shopping.csv"
+        resp.headers["Content-Type"] = "text/csv; charset=utf-8"
+        return resp
+
+    @app.route('/download_shopping', methods=['GET', 'POST'])
+    def download_shopping():
+        try:
+            shopping = posted_shopping()
+        except (AttributeError, KeyError, TypeError, ValueError):
+            return "Некоректний план.", 400
+        if not shopping:
+            return "Немає списку покупок.", 400
+        mem = io.BytesIO()
+        mem.write(shopping_csv(shopping).encode('utf-8'))
+        mem.seek(0)
+        return send_file(mem, mimetype='text/csv', as_attachment=True, download_name='shopping.csv')
+
+    @app.route('/api/plan', methods=['POST'])
+    def api_plan():
+        payload = request.get_json(force=True)
+        key = plan_response_key(payload)
+        entry = responses.get(key) if key is not None else None
+        if entry is not None:
+            return cached_response(entry)
+        try:
+            result = plan_for_payload(planner, payload)
+        except (AttributeError, TypeError, ValueError) as e:
+            return jsonify({'ok': False, 'error': str(e)}), 400
+        resp = jsonify(result)
+        if key is not None and plan_is_final(result):
+            return cached_response(responses.put(key, resp.get_data(), resp.content_type))
+        return resp
+
+    @app.route('/api/plans', methods=['POST'])
+    def api_plans():
+        """Plans for a list of /api/plan payloads, streamed as NDJSON in request order."""
+        payload = request.get_json(force=True)
+        requests = payload.get('requests') if isinstance(payload, dict) else payload
+        if not isinstance(requests, list):
+            return jsonify({'ok': False, 'error': 'expected a list of requests'}), 400
+
+        def lines():
+            for plan in planner.generate_plans(requests):
+                yield json.dumps(plan, ensure_ascii=False) + '\n'
+        return Response(lines(), mimetype='application/x-ndjson')
+
+    @app.route('/api/swap', methods=['POST'])
+    def api_swap():
+        """Swap one meal of the posted plan for another; the changed plan and shopping list come back."""
+        payload = request.get_json(force=True)
+        category = payload.get('category')
+        if category not in CATEGORY_TAGS:
+            return jsonify({'ok': False, 'error': 'unknown category'}), 400
+        the_plan = payload.get('plan')
+        shopping = payload.get('shopping')
+        if not the_plan:
+            return jsonify({'ok': False, 'error': 'no plan'}), 400
+        seed = parse_seed(payload.get('seed'))
+        try:
+            if shopping is None:
+                shopping = build_shopping_list(the_plan)
+            meal = planner.swap_meal(the_plan, category, payload.get('forbidden'),
+                                     rng=random.Random(seed) if seed is not None else None, shopping=shopping)
+        except (AttributeError, KeyError, TypeError, ValueError):
+            return jsonify({'ok': False, 'error': 'invalid plan'}), 400
+        if meal is None:
+            return jsonify({'ok': False, 'error': 'no other recipe'}), 404
+        return jsonify({'ok': True, 'meal': meal, 'plan': the_plan, 'shopping': shopping})
+
+    @app.route('/api/cache_stats', methods=['GET'])
+    def cache_stats():
+        stats = planner.plan_cache.stats()
+        stats['responses'] = responses.stats()
+        return jsonify(stats)
+
+    @app.route('/save_plan', methods=['POST'])
+    def save_plan():
+        payload = request.get_json(force=True)
+        try:
+            path = saved_plan_path()
+            write_saved_plan(path, payload)
             return jsonify({'ok': True, 'path': path})
         except Exception as e:
             return jsonify({'ok': False, 'error': str(e)}), 500
 
     @app.route('/rate', methods=['POST'])
     def rate():
-        recipe_id = request.form.get('recipe_id')
-        try:
-            value = float(request.form.get('value', '0'))
-        except Exception:
-            value = 0.0
-        found = None
-        for r in RECIPES:
-            if r.id == recipe_id:
-                found = r
-                break
-        if not found:
-            return jsonify({'ok': False, 'error': 'recipe not found'}), 404
-        found.add_rating(value)
-        return jsonify({'ok': True, 'rating': found.rating, 'votes': found.votes})
+        body, status = rate_from_form(planner, responses, request.form, ratings)
+        return jsonify(body), status
+
+    return app
+
 
+def run_flask(host='127.0.0.1', port=5000, catalog_path: Optional[str] = None):
+    if not FLASK_AVAILABLE:
+        print("Flask is not installed. Install with: pip install flask")
+        return
+    app = create_app(catalog_path)
     print(f"Starting server at http://{host}:{port}")
     app.run(host=host, port=port)
 
+# ----------------------------
+# Async server (--serve --async)
+# ----------------------------
+# plans computed at once by the async server; further requests wait on the event loop, not in a thread
+ASYNC_PLAN_THREADS = 4
+# threads writing /save_plan files
+ASYNC_IO_THREADS = 2
+# threads running the Flask app for every other route (/plan, the pages, assets, downloads)
+ASYNC_WSGI_THREADS = 8
+
+
+def _wsgi_environ(scope: dict, body: bytes) -> dict:
+    """PEP 3333 environ for an ASGI http scope and its complete request body."""
+    script_name = scope.get('root_path', '').encode('utf-8').decode('latin-1')
+    path_info = scope['path'].encode('utf-8').decode('latin-1')
+    if path_info.startswith(script_name):
+        path_info = path_info[len(script_name):]
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': script_name,
+        'PATH_INFO': path_info,
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': 'HTTP/%s' % scope.get('http_version', '1.1'),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    if scope.get('client'):
+        environ['REMOTE_ADDR'] = scope['client'][0]
+    for name, value in scope.get('headers', ()):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            name = 'HTTP_' + name
+        value = value.decode('latin-1')
+        # repeated headers are joined, as a WSGI server would
+        environ[name] = environ[name] + ',' + value if name in environ else value
+    return environ
+
+
+def create_asgi_app(app: 'Flask', plan_threads: int = ASYNC_PLAN_THREADS):
+    """ASGI front end for a create_app() app.
+
+    /api/plan, /rate and /save_plan run as coroutines; the other routes run the Flask app on a thread pool.
+    """
+    shared = app.extensions['nutrition']
+    planner, responses, ratings = shared['planner'], shared['responses'], shared.get('ratings')
+    planning = ThreadPoolExecutor(plan_threads, thread_name_prefix='plan')
+    disk = ThreadPoolExecutor(ASYNC_IO_THREADS, thread_name_prefix='save_plan')
+    wsgi_pool = ThreadPoolExecutor(ASYNC_WSGI_THREADS, thread_name_prefix='wsgi')
+    slots = asyncio.Semaphore(plan_threads)
+
+    async def on_planning_thread(fn, *args):
+        async with slots:
+            return await asyncio.get_running_loop().run_in_executor(planning, fn, *args)
+
+    async def read_body(receive) -> bytes:
+        chunks = []
+        while True:
+            message = await receive()
+            chunks.append(message.get('body', b''))
+            if not message.get('more_body'):
+                return b''.join(chunks)
+
+    async def reply(send, status: int, body: bytes, headers: dict):
+        await send({'type': 'http.response.start', 'status': status,
+                    'headers': [(k.lower().encode('latin-1'), str(v).encode('latin-1')) for k, v in headers.items()]})
+        await send({'type': 'http.response.body', 'body': body})
+
+    def json_body(obj) -> bytes:
+        # the same bytes jsonify() produces, so both front ends share cache entries and ETags
+        return (app.json.dumps(obj) + '\n').encode('utf-8')
+
+    async def reply_json(send, obj, status: int = 200):
+        await reply(send, status, json_body(obj), {'Content-Type': app.json.mimetype})
+
+    async def api_plan(headers: dict, receive, send):
+        try:
+            payload = json.loads(await read_body(receive))
+        except ValueError:
+            return await reply_json(send, {'ok': False, 'error': 'invalid JSON'}, 400)
+        key = plan_response_key(payload) if isinstance(payload, dict) else None
+        entry = responses.get(key) if key is not None else None
+        if entry is None:
+            try:
+                result = await on_planning_thread(plan_for_payload, planner, payload)
+            except (AttributeError, TypeError, ValueError) as e:
+                return await reply_json(send, {'ok': False, 'error': str(e)}, 400)
+            if key is None or not plan_is_final(result):
+                return await reply_json(send, result)
+            entry = responses.put(key, json_body(result), app.json.mimetype)
+        await reply(send, *negotiate(entry, headers.get('accept-encoding'), headers.get('if-none-match')))
+
+    async def rate(headers: dict, receive, send):
+        form = {k: v[-1] for k, v in urllib.parse.parse_qs((await read_body(receive)).decode('utf-8')).items()}
+        body, status = await on_planning_thread(rate_from_form, planner, responses, form, ratings)
+        await reply_json(send, body, status)
+
+    async def save_plan(headers: dict, receive, send):
+        try:
+            payload = json.loads(await read_body(receive))
+            path = saved_plan_path()
+            await asyncio.get_running_loop().run_in_executor(disk, write_saved_plan, path, payload)
+        except Exception as e:
+            return await reply_json(send, {'ok': False, 'error': str(e)}, 500)
+        await reply_json(send, {'ok': True, 'path': path})
+
+    async def wsgi(scope, receive, send):
+        loop = asyncio.get_running_loop()
+        environ = _wsgi_environ(scope, await read_body(receive))
+        head = {}
+
+        def start_response(status, headers, exc_info=None):
+            if exc_info and head.get('sent'):
+                raise exc_info[1].with_traceback(exc_info[2])
+            head['message'] = {'type': 'http.response.start', 'status': int(status.split(' ', 1)[0]),
+                               'headers': [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in headers]}
+            return lambda data: forward(data)
+
+        def deliver(message):
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        def forward(chunk: bytes, more: bool = True):
+            if not head.get('sent'):
+                head['sent'] = True
+                deliver(head['message'])
+            deliver({'type': 'http.response.body', 'body': chunk, 'more_body': more})
+
+        def run():
+            result = app(environ, start_response)
+            try:
+                for chunk in result:
+                    if chunk:
+                        forward(chunk)
+                forward(b'', more=False)
+            finally:
+                if hasattr(result, 'close'):
+                    result.close()
+
+        await loop.run_in_executor(wsgi_pool, run)
+
+    routes = {('POST', '/api/plan'): api_plan, ('POST', '/rate'): rate, ('POST', '/save_plan'): save_plan}
+
+    async def asgi(scope, receive, send):
+        if scope['type'] == 'lifespan':
+            while True:
+                message = await receive()
+                if message['type'] == 'lifespan.startup':
+                    await send({'type': 'lifespan.startup.complete'})
+                elif message['type'] == 'lifespan.shutdown':
+                    planning.shutdown(wait=False)
+                    wsgi_pool.shutdown(wait=False)
+                    disk.shutdown(wait=True)
+                    await send({'type': 'lifespan.shutdown.complete'})
+                    return
+        handler = routes.get((scope.get('method'), scope.get('path')))
+        headers = {k.decode('latin-1').lower(): v.decode('latin-1') for k, v in scope.get('headers', ())}
+        # multipart /rate forms are left to Flask's parser
+        if handler is rate and not headers.get('content-type', '').startswith('application/x-www-form-urlencoded'):
+            handler = None
+        if handler is None:
+            return await wsgi(scope, receive, send)
+        if ratings is not None:
+            replay_ratings(planner, responses, ratings)
+        await handler(headers, receive, send)
+
+    return asgi
+
+
+def run_async_server(host='127.0.0.1', port=5000, catalog_path: Optional[str] = None):
+    if not FLASK_AVAILABLE:
+        print("Flask is not installed. Install with: pip install flask")
+        return
+    if not ASYNC_AVAILABLE:
+        print("--async needs uvicorn. Install with: pip install uvicorn")
+        return
+    app = create_app(catalog_path)
+    print(f"Starting async server at http://{host}:{port}")
+    uvicorn.run(create_asgi_app(app), host=host, port=port, lifespan='on')
+
+# ----------------------------
+# Pre-fork server (--serve --workers)
+# ----------------------------
+# gunicorn request threads per worker process, and seconds an idle keep-alive connection is held open
+PREFORK_THREADS = 4
+KEEPALIVE_TIMEOUT = 5
+# connections a worker of the built-in server serves at once; a full worker stops accepting
+PREFORK_CONNECTIONS = 64
+
+
+def freeze_for_fork():
+    """Keep the objects created so far out of the collector, so pages shared with forked children stay shared."""
+    if hasattr(gc, 'freeze'):
+        gc.freeze()
+
+
+class _KeepAliveServerHandler(wsgiref.simple_server.ServerHandler):
+    http_version = '1.1'
+
+    def cleanup_headers(self):
+        super().cleanup_headers()
+        # without a length the end of a (streamed) body can only be marked by closing
+        if 'Content-Length' not in self.headers or self.request_handler.close_connection:
+            self.headers['Connection'] = 'close'
+            self.request_handler.close_connection = True
+
+
+class _KeepAliveRequestHandler(wsgiref.simple_server.WSGIRequestHandler):
+    """wsgiref's handler, serving HTTP/1.1 requests until the client closes or idles out."""
+
+    protocol_version = 'HTTP/1.1'
+    timeout = KEEPALIVE_TIMEOUT
+
+    def handle(self):
+        # BaseHTTPRequestHandler loops over requests; wsgiref's handle() serves only one
+        BaseHTTPRequestHandler.handle(self)
+
+    def handle_one_request(self):
+        try:
+            self.raw_requestline = self.rfile.readline(65537)
+        except TimeoutError:
+            self.close_connection = True
+            return
+        if not self.raw_requestline:
+            self.close_connection = True
+            return
+        if len(self.raw_requestline) > 65536:
+            self.requestline = self.request_version = self.command = ''
+            self.send_error(414)
+            return
+        if not self.parse_request():
+            return
+        environ = self.get_environ()
+        if 'chunked' in self.headers.get('Transfer-Encoding', '').lower():
+            body = DechunkedInput(self.rfile)
+            environ.pop('CONTENT_LENGTH', None)
+            environ['wsgi.input_terminated'] = True
+        else:
+            try:
+                length = int(environ.get('CONTENT_LENGTH') or 0)
+            except ValueError:
+                length = 0
+                self.close_connection = True
+            body = LimitedStream(self.rfile, length)
+        handler = _KeepAliveServerHandler(body, self.wfile, self.get_stderr(), environ, multithread=True)
+        handler.request_handler = self
+        handler.run(self.server.get_app())
+        # the next request starts where this body ends, whatever the app read of it
+        if not self.close_connection:
+            try:
+                while body.read(65536):
+                    pass
+            except OSError:
+                self.close_connection = True
+
+
+class _KeepAliveWSGIServer(socketserver.ThreadingMixIn, wsgiref.simple_server.WSGIServer):
+    """Thread-per-connection WSGI server on an already listening socket, at most PREFORK_CONNECTIONS at once."""
+
+    daemon_threads = True
+
+    def __init__(self, sock: socket.socket, app):
+        self._slots = threading.BoundedSemaphore(PREFORK_CONNECTIONS)
+        host, port = sock.getsockname()[:2]
+        super().__init__((host, port), _KeepAliveRequestHandler, bind_and_activate=False)
+        self.socket.close()
+        self.socket = sock
+        self.server_name = socket.getfqdn(host)
+        self.server_port = port
+        self.setup_environ()
+        self.set_app(app)
+
+    def process_request(self, request, client_address):
+        # waiting here leaves new connections in the shared backlog for the other workers
+        self._slots.acquire()
+        try:
+            super().process_request(request, client_address)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def process_request_thread(self, request, client_address):
+        try:
+            super().process_request_thread(request, client_address)
+        finally:
+            self._slots.release()
+
+
+def run_prefork_server(host='127.0.0.1', port=5000, catalog_path: Optional[str] = None,
+                       workers: Optional[int] = None):
+    """Serve create_app() from `workers` forked processes (default: CPU count) sharing one loaded catalog.
+
+    Uses gunicorn when installed, otherwise a keep-alive wsgiref server on a shared socket.
+    """
+    if not FLASK_AVAILABLE:
+        print("Flask is not installed. Install with: pip install flask")
+        return
+    workers = max(1, workers or os.cpu_count() or 1)
+    if not hasattr(os, 'fork'):
+        print("--workers needs os.fork(); serving from a single process")
+        run_flask(host, port, catalog_path)
+        return
+    import tempfile
+    fd, ratings_path = tempfile.mkstemp(prefix='ratings-', suffix='.jsonl')
+    os.close(fd)
+    master = os.getpid()
+    try:
+        _serve_prefork(host, port, create_app(catalog_path, ratings_path), workers)
+    finally:
+        # gunicorn workers leave through SystemExit and come by here too
+        if os.getpid() == master:
+            os.unlink(ratings_path)
+
+
+def _serve_prefork(host: str, port: int, app, workers: int):
+    freeze_for_fork()
+    if GUNICORN_AVAILABLE:
+        class Server(gunicorn.app.base.BaseApplication):
+            def load_config(self):
+                for name, value in {'bind': f'{host}:{port}', 'workers': workers, 'worker_class': 'gthread',
+                                    'threads': PREFORK_THREADS, 'keepalive': KEEPALIVE_TIMEOUT,
+                                    'preload_app': True}.items():
+                    self.cfg.set(name, value)
+
+            def load(self):
+                return app
+        print(f"Starting {workers} gunicorn workers at http://{host}:{port}")
+        Server().run()
+        return
+
+    sock = socket.create_server((host, port), backlog=1024)
+    children = set()
+    stopping = False
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            try:
+                _KeepAliveWSGIServer(sock, app).serve_forever()
+            finally:
+                os._exit(0)
+        children.add(pid)
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    for _ in range(workers):
+        spawn()
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    print(f"Starting {workers} workers at http://{host}:{port}")
+    try:
+        while children:
+            try:
+                pid, _ = os.wait()
+            except ChildProcessError:
+                break
+            children.discard(pid)
+            if not stopping:
+                spawn()
+    finally:
+        sock.close()
+
+# ----------------------------
+# Bulk planning (--batch)
+# ----------------------------
+# (mood, goal, forbidden) groups a batch worker keeps scored between chunks
+BATCH_GROUPS_KEPT = 64
+_BATCH_STATE: dict = {}
+
+
+def iter_batch_requests(path: str) -> Iterable:
+    """Requests from a CSV file or JSONL ('-' reads stdin), one at a time.
+
+    Unreadable lines come through as ValueError instances, keeping one output line per input line.
+    """
+    if path.lower().endswith('.csv'):
+        with open(path, encoding='utf-8', newline='') as f:
+            for row in csv.DictReader(f):
+                req = {k: v for k, v in row.items() if k and v not in (None, '')}
+                req['forbidden'] = split_forbidden(req.get('forbidden', ''))
+                yield req
+        return
+    f = sys.stdin if path == '-' else open(path, encoding='utf-8')
+    try:
+        for n, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                req = json.loads(line)
+            except ValueError as e:
+                yield ValueError(f"line {n}: {e}")
+                continue
+            yield req if isinstance(req, dict) else ValueError(f"line {n}: expected a JSON object")
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def _batch_init(catalog_path: Optional[str]):
+    # forked workers inherit the parent's planner; spawned ones load their own once
+    if 'planner' not in _BATCH_STATE:
+        _BATCH_STATE['planner'] = MenuPlanner(catalog=RecipeCatalog.open(catalog_path or SAMPLE_CATALOG_PATH))
+        _BATCH_STATE['groups'] = {}
+
+
+def _plan_batch_chunk(chunk: list) -> tuple:
+    """JSON lines for one chunk of requests, and how many of them are errors."""
+    groups = _BATCH_STATE['groups']
+    if len(groups) > BATCH_GROUPS_KEPT:
+        groups.clear()
+    plans = _BATCH_STATE['planner'].generate_plans([r for r in chunk if isinstance(r, dict)], groups=groups)
+    lines = []
+    errors = 0
+    for req in chunk:
+        rec = next(plans) if isinstance(req, dict) else {'id': None, 'error': str(req)}
+        errors += 'error' in rec
+        lines.append(json.dumps(rec, ensure_ascii=False))
+    return lines, errors
+
+
+def run_batch_cli(input_path: str, output_path: str = '-', catalog_path: Optional[str] = None,
+                  workers: Optional[int] = None, chunk_size: int = 256) -> dict:
+    """Plan every request of `input_path` and write the plans as JSONL, in input order.
+
+    Input is read and output written chunk by chunk on a forked pool; throughput goes to stderr.
+    """
+    workers = max(1, workers or os.cpu_count() or 1)
+    started = time.perf_counter()
+    _batch_init(catalog_path)
+    requests = iter_batch_requests(input_path)
+    chunks = iter(lambda: list(itertools.islice(requests, chunk_size)), [])
+    out = sys.stdout if output_path == '-' else open(output_path, 'w', encoding='utf-8')
+    done = errors = 0
+    last_report = started
+    pool = None
+    finished = False
+    try:
+        if workers == 1:
+            results = map(_plan_batch_chunk, chunks)
+        else:
+            freeze_for_fork()
+            methods = multiprocessing.get_all_start_methods()
+            ctx = multiprocessing.get_context('fork' if 'fork' in methods else None)
+            # Pool feeds tasks from a thread that would otherwise read the whole input ahead
+            window = threading.Semaphore(workers * 4)
+            stop = threading.Event()
+
+            def throttled():
+                for chunk in chunks:
+                    window.acquire()
+                    if stop.is_set():
+                        return
+                    yield chunk
+            pool = ctx.Pool(workers, initializer=_batch_init, initargs=(catalog_path,))
+            results = pool.imap(_plan_batch_chunk, throttled())
+        for lines, errs in results:
+            if pool is not None:
+                window.release()
+            out.write('\n'.join(lines) + '\n')
+            done += len(lines)
+            errors += errs
+            now = time.perf_counter()
+            if now - last_report >= 10:
+                print(f"{done} plans, {done / (now - started):.0f} plans/s", file=sys.stderr)
+                last_report = now
+        finished = True
+    finally:
+        if pool is not None:
+            if finished:
+                pool.close()
+            else:
+                # the feeder thread may be waiting for the window; wake it so the pool can stop
+                stop.set()
+                window.release()
+                pool.terminate()
+            pool.join()
+        if out is not sys.stdout:
+            out.close()
+    elapsed = time.perf_counter() - started
+    stats = {'plans': done, 'errors': errors, 'workers': workers, 'seconds': round(elapsed, 3),
+             'plans_per_second': round(done / elapsed, 1) if elapsed else 0.0}
+    print(f"Planned {done} requests ({errors} errors) in {elapsed:.2f}s with {workers} workers: "
+          f"{stats['plans_per_second']:.0f} plans/s", file=sys.stderr)
+    return stats
+
 # ----------------------------
 # CLI demo
 # ----------------------------
-def run_demo_cli():
-    load_sample_recipes()
-    planner = MenuPlanner(RECIPES)
+def run_demo_cli(catalog_path: Optional[str] = None):
+    planner = MenuPlanner(catalog=RecipeCatalog.open(catalog_path or SAMPLE_CATALOG_PATH))
     p = DEFAULT_PROFILE.copy()
     plan = planner.generate_plan('energetic', 'maintain-weight', p)
     print(json.dumps(plan, ensure_ascii=False, indent=2))
@@ -1707,12 +4050,32 @@ def main():
     import argparse
     parser = argparse.ArgumentParser(description='AI Nutrition Consultant (updated: AI photos)')
     parser.add_argument('--serve', action='store_true', help='Run web server (Flask)')
+    parser.add_argument('--async', dest='use_async', action='store_true',
+                        help='With --serve: answer the JSON API from an asyncio event loop (needs uvicorn)')
     parser.add_argument('--demo', action='store_true', help='Run demo CLI')
+    parser.add_argument('--catalog', help='Recipe catalog file (.jsonl, .db/.sqlite or .rcat); defaults to the bundled recipes.jsonl')
+    parser.add_argument('--build-catalog', metavar='OUT.rcat', help='Convert --catalog (or the bundled recipes) into the mmap-able binary format and exit')
+    parser.add_argument('--batch', metavar='INPUT', help='Plan every profile in INPUT (.csv or JSONL, - for stdin) and write JSONL plans')
+    parser.add_argument('--output', default='-', help='Where --batch writes plans (default: stdout)')
+    parser.add_argument('--workers', type=int, help='Worker processes for --batch (default: CPU count) or --serve')
+    parser.add_argument('--chunk-size', type=int, default=256, help='Requests per --batch work unit')
     args = parser.parse_args()
-    if args.serve:
-        run_flask()
+    if args.serve and args.use_async and args.workers:
+        parser.error('--async serves from a single process and cannot be combined with --workers')
+    if args.build_catalog:
+        src = args.catalog or SAMPLE_CATALOG_PATH
+        n = build_binary_catalog(catalog_loader(src).iter_recipes(), args.build_catalog)
+        print(f"Wrote {n} recipes from {src} to {args.build_catalog}")
+    elif args.batch:
+        run_batch_cli(args.batch, args.output, args.catalog, args.workers, args.chunk_size)
+    elif args.serve and args.use_async:
+        run_async_server(catalog_path=args.catalog)
+    elif args.serve and args.workers:
+        run_prefork_server(catalog_path=args.catalog, workers=args.workers)
+    elif args.serve:
+        run_flask(catalog_path=args.catalog)
     elif args.demo:
-        run_demo_cli()
+        run_demo_cli(args.catalog)
     else:
         print("No mode specified. Use --serve to run the web UI or --demo to run CLI demo.")
 